@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+## INFO ##
+## INFO ##
+
+# Import python modules
+from sys         import (exit,
+                         version,
+                         executable)
+from json        import (dumps,
+                         loads)
+from time        import (strftime,
+                         perf_counter)
+from tempfile    import mkdtemp
+from shutil      import rmtree
+from statistics  import median
+from os.path     import (join,
+                         dirname,
+                         abspath)
+from collections import OrderedDict
+from argparse    import ArgumentParser
+from subprocess  import (run,
+                         DEVNULL,
+                         CalledProcessError)
+
+# Import benchmark modules
+from generate    import (generate,
+                         modify,
+                         arguments)
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+JANITOR   = join(dirname(dirname(abspath(__file__))), 'src', 'janitor.py')
+REPEAT    = 3
+MODIFIED  = 0.01
+# The command line flags and the required module of each hasher
+HASHERS   = OrderedDict((('md5'   , (('--md5',), None)),
+                         ('sha1'  , (('--sha',), None)),
+                         ('xxhash', ((), 'pyhashxx'))))
+SCENARIOS = 'prefix', 'cold', 'warm', 'modified', 'rebuild'
+STATS     = 'stats.json'
+TREE      = 'tree'
+
+
+
+#------------------------------------------------------------------------------#
+def commit_of(janitor):
+    # Return the commit of the checkout containing janitor, and
+    # whether it has uncommitted changes or not (None if unknown)
+    folder = dirname(janitor)
+    try:
+        commit = run(('git', 'rev-parse', 'HEAD'), cwd=folder, check=True,
+                     capture_output=True, text=True).stdout.strip()
+        dirty  = bool(run(('git', 'status', '--porcelain', '--', '.'),
+                          cwd=folder, check=True, capture_output=True,
+                          text=True).stdout.strip())
+    except (OSError, CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+
+#------------------------------------------------------------------------------#
+def available(module):
+    # If module can be imported by the interpreter running janitor
+    return (module is None or
+            run((executable, '-c', 'import ' + module),
+                stdout=DEVNULL, stderr=DEVNULL).returncode == 0)
+
+
+
+#------------------------------------------------------------------------------#
+def janitor(command, tree, stats, *flags):
+    # Run janitor on tree, and return the wall clock time of the whole
+    # process (including the start of the interpreter) and its statistics
+    start = perf_counter()
+    run(command + flags + ('--path=' + tree, '--stats=' + stats),
+        stdout=DEVNULL, check=True)
+    wall = perf_counter() - start
+    with open(stats) as file:
+        return wall, loads(file.read().splitlines()[-1])
+
+
+
+#------------------------------------------------------------------------------#
+def kill(command, tree):
+    # Remove the cache of janitor from tree
+    run(command + ('--kill', '--path=' + tree), stdout=DEVNULL, check=True)
+
+
+
+#------------------------------------------------------------------------------#
+def measure(command, work, flags, tree_options, modified):
+    # Run all the scenarios once on a newly generated tree,
+    # and return the wall time and the statistics of each
+    tree  = join(work, TREE)
+    stats = join(work, STATS)
+    files = generate(tree, **tree_options)
+    runs  = OrderedDict()
+    # The first run writes the headers of the generated files (and hashes
+    # them again), so it is measured on its own, and its cache is removed,
+    # so the other scenarios are measured on the same (prefixed) tree
+    runs['prefix']   = janitor(command, tree, stats, *flags)
+    kill(command, tree)
+    runs['cold']     = janitor(command, tree, stats, *flags)
+    runs['warm']     = janitor(command, tree, stats, *flags)
+    modify(files, modified, tree_options['seed'])
+    runs['modified'] = janitor(command, tree, stats, *flags)
+    runs['rebuild']  = janitor(command, tree, stats, '--rebuild', *flags)
+    return runs
+
+
+
+#------------------------------------------------------------------------------#
+def summarize(samples):
+    # Return the medians of the wall times, the total times and the
+    # phases of the samples, and the counters of the first one (all
+    # of them are the same, as the same tree is generated each time)
+    phases = OrderedDict()
+    for _, stats in samples:
+        for phase in stats['phases']:
+            phases[phase] = median(s['phases'].get(phase, 0.0)
+                                       for _, s in samples)
+    return OrderedDict((
+        ('wall'    , median(wall for wall, _ in samples)),
+        ('wall_min', min(wall for wall, _ in samples)),
+        ('total'   , median(stats['total'] for _, stats in samples)),
+        ('phases'  , phases),
+        ('counters', samples[0][1]['counters']),
+    ))
+
+
+
+#------------------------------------------------------------------------------#
+def baseline_of(path, tree, modified):
+    # Return the results of the last record in the file at path,
+    # which was measured on the same tree, or None if there is none
+    found = None
+    try:
+        with open(path) as file:
+            for line in file:
+                record = loads(line)
+                if (record['tree'] == tree and
+                    record['modified'] == modified):
+                        found = record['results']
+    except FileNotFoundError:
+        pass
+    return found
+
+
+
+#------------------------------------------------------------------------------#
+def report(results, baseline=None):
+    # Print the results as a table (compared to the baseline if there is one)
+    row = '{:<8} {:<9} {:>9} {:>9} {:>7} {:>7} {:>12}{}'
+    print(row.format('hasher', 'scenario', 'wall (s)', 'total (s)',
+                     'visited', 'hashed', 'bytes', '  vs baseline'))
+    for hasher, scenarios in results.items():
+        for scenario, result in scenarios.items():
+            counters = result['counters']
+            try:
+                ratio = '  {:>+10.1%}'.format(
+                    result['total']/baseline[hasher][scenario]['total'] - 1)
+            except (TypeError, KeyError, ZeroDivisionError):
+                ratio = ''
+            print(row.format(hasher, scenario,
+                             '{:.3f}'.format(result['wall']),
+                             '{:.3f}'.format(result['total']),
+                             counters['visited'],
+                             counters['hashed'],
+                             counters['bytes'],
+                             ratio))
+
+
+
+#------------------------------------------------------------------------------#
+def main():
+    parser = ArgumentParser(description='Time janitor on synthetic trees '
+                                        'when it writes the headers, and '
+                                        'with cold, warm, modified and '
+                                        'rebuilt caches')
+    arguments(parser)
+    parser.add_argument('--hashers', default=','.join(HASHERS),
+                        help='hashers separated by commas '
+                             '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='number of runs of each scenario, the '
+                             'medians are reported (default: %(default)s)')
+    parser.add_argument('--modified', type=float, default=MODIFIED,
+                        help='proportion of the files modified before the '
+                             'modified scenario (default: %(default)s)')
+    parser.add_argument('--janitor', default=JANITOR,
+                        help='the janitor.py to run (default: %(default)s)')
+    parser.add_argument('--flags', default='',
+                        help='extra janitor arguments separated by spaces, '
+                             'for example: "--jobs=4 --processes"')
+    parser.add_argument('--work', default=None,
+                        help='the trees are generated here (default: '
+                             'a new temporary folder, removed at the end)')
+    parser.add_argument('--output', default=None,
+                        help='append the results as a line of JSON')
+    parser.add_argument('--baseline', default=None,
+                        help='compare the results to the last line of JSON '
+                             'in this file measured on the same tree')
+    options = parser.parse_args()
+
+    tree_options = OrderedDict((('files'   , options.files),
+                                ('depth'   , options.depth),
+                                ('fanout'  , options.fanout),
+                                ('sizes'   , options.sizes),
+                                ('excluded', options.excluded),
+                                ('seed'    , options.seed)))
+    command      = (executable, abspath(options.janitor))
+    flags        = tuple(options.flags.split())
+    work         = options.work or mkdtemp(prefix='janitor-bench-')
+    results      = OrderedDict()
+    try:
+        for hasher in options.hashers.split(','):
+            try:
+                hasher_flags, module = HASHERS[hasher]
+            except KeyError:
+                print('Unknown hasher: {!r}'.format(hasher))
+                exit(1)
+            if not available(module):
+                print('Skips {}: {} is not installed'.format(hasher, module))
+                continue
+            samples = OrderedDict((scenario, []) for scenario in SCENARIOS)
+            for _ in range(options.repeat):
+                runs = measure(command, work, hasher_flags + flags,
+                               tree_options, options.modified)
+                for scenario, sample in runs.items():
+                    samples[scenario].append(sample)
+            results[hasher] = OrderedDict((scenario, summarize(runs))
+                                             for scenario, runs
+                                             in samples.items())
+    finally:
+        if options.work is None:
+            rmtree(work, ignore_errors=True)
+
+    # Sizes are compared to the (list) values of the loaded baselines
+    tree_options['sizes'] = [list(pair) for pair in options.sizes]
+    commit, dirty = commit_of(command[1])
+    record = OrderedDict((('date'    , strftime('%Y-%m-%dT%H:%M:%S')),
+                          ('commit'  , commit),
+                          ('dirty'   , dirty),
+                          ('python'  , version.split()[0]),
+                          ('flags'   , options.flags),
+                          ('repeat'  , options.repeat),
+                          ('modified', options.modified),
+                          ('tree'    , tree_options),
+                          ('results' , results)))
+    baseline = (baseline_of(options.baseline, tree_options, options.modified)
+                    if options.baseline else None)
+    print('Commit: {}{}'.format(commit, ' (dirty)' if dirty else ''))
+    report(results, baseline)
+    if options.output:
+        with open(options.output, mode='a') as file:
+            file.write(dumps(record) + '\n')
+
+
+
+#------------------------------------------------------------------------------#
+if __name__ == '__main__':
+    main()
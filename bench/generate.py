@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+## INFO ##
+## INFO ##
+
+# Import python modules
+from json        import dump
+from random      import Random
+from shutil      import rmtree
+from os          import makedirs
+from os.path     import (join,
+                         exists)
+from argparse    import ArgumentParser
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+FILES          = 1000
+DEPTH          = 3
+FANOUT         = 4
+EXCLUDED       = 0.1
+SEED           = 0
+# (size in bytes, weight) pairs of the file sizes
+SIZES          = ((2**8 , 50),
+                  (2**12, 35),
+                  (2**16, 12),
+                  (2**20,  3))
+# Extensions of the included files, all of them are handled by a module
+EXTENSIONS     = 'py', 'c', 'h', 'js', 'txt'
+# The folder name, which is excluded by the generated configuration file
+EXCLUDE_FOLDER = 'build'
+# The lines of the file contents, every TAG_EVERY-th line has a tag in it
+LINE           = '# line {} of {}, nothing to see here, nothing to fix here\n'
+TAGGED         = '# TODO: line {} of {}, FIXME: nothing to fix here\n'
+TAG_EVERY      = 128
+CONFIG         = 'JANITOR'
+
+
+
+#------------------------------------------------------------------------------#
+def parse_sizes(text):
+    # Convert 'SIZE:WEIGHT,SIZE:WEIGHT,...' to (size, weight) pairs
+    sizes = []
+    for pair in text.split(','):
+        size, _, weight = pair.partition(':')
+        sizes.append((int(size), int(weight or 1)))
+    return tuple(sizes)
+
+
+
+#------------------------------------------------------------------------------#
+def content(name, size):
+    # Return text of exactly size bytes
+    lines = []
+    total = 0
+    index = 0
+    while total < size:
+        index += 1
+        line   = (LINE if index % TAG_EVERY else TAGGED).format(index, name)
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines)[:size]
+
+
+
+#------------------------------------------------------------------------------#
+def folders_of(path, depth, fanout):
+    # Return all the folders of a tree, fanout subfolders in each folder
+    # and depth levels deep (path itself is not included)
+    folders = []
+    level   = [path]
+    for _ in range(depth):
+        level = [join(folder, 'd{}'.format(index))
+                     for folder in level
+                     for index in range(fanout)]
+        folders.extend(level)
+    return folders
+
+
+
+#------------------------------------------------------------------------------#
+def generate(path, files    = FILES,
+                   depth    = DEPTH,
+                   fanout   = FANOUT,
+                   sizes    = SIZES,
+                   excluded = EXCLUDED,
+                   seed     = SEED):
+    # Create a new tree at path, and return the paths of the included files,
+    # the same arguments always generate the same tree with the same content
+    if exists(path):
+        rmtree(path)
+    random  = Random(seed)
+    folders = [path] + folders_of(path, depth, fanout)
+    weights = [weight for size, weight in sizes]
+    sizes   = [size for size, weight in sizes]
+    created = []
+    for index in range(files):
+        folder = random.choice(folders)
+        size   = random.choices(sizes, weights)[0]
+        # Half of the excluded files are inside an excluded
+        # folder, the other half has an excluded extension
+        if random.random() < excluded:
+            if index & 1:
+                folder = join(folder, EXCLUDE_FOLDER)
+                name   = 'f{}.{}'.format(index, random.choice(EXTENSIONS))
+            else:
+                name   = 'f{}.o'.format(index)
+            file = None
+        else:
+            name = 'f{}.{}'.format(index, random.choice(EXTENSIONS))
+            file = join(folder, name)
+            created.append(file)
+        makedirs(folder, exist_ok=True)
+        with open(join(folder, name), mode='w') as output:
+            output.write(content(name, size))
+
+    # Write the configuration: exclude the build folders
+    # and do not create a version file in the tree
+    with open(join(path, CONFIG), mode='w') as output:
+        dump({'exclude'  : {'folders'       : [EXCLUDE_FOLDER],
+                            'extend_default': ['folders']},
+              'versioner': {'use': False}}, output, indent=4)
+    return created
+
+
+
+#------------------------------------------------------------------------------#
+def modify(files, ratio, seed=SEED):
+    # Append a line to ratio of the files (at least one of them), and
+    # return them, the same arguments always modify the same files
+    count    = max(1, round(len(files)*ratio))
+    modified = Random(seed).sample(sorted(files), min(count, len(files)))
+    for file in modified:
+        with open(file, mode='a') as output:
+            output.write(LINE.format(0, 'modified'))
+    return modified
+
+
+
+#------------------------------------------------------------------------------#
+def arguments(parser):
+    # Add the arguments describing a tree to parser
+    parser.add_argument('--files', type=int, default=FILES,
+                        help='number of generated files '
+                             '(default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=DEPTH,
+                        help='number of folder levels (default: %(default)s)')
+    parser.add_argument('--fanout', type=int, default=FANOUT,
+                        help='number of subfolders in each folder '
+                             '(default: %(default)s)')
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES,
+                        help='file size distribution as SIZE:WEIGHT pairs '
+                             'separated by commas (default: {})'.format(
+                                 ','.join('{}:{}'.format(*p) for p in SIZES)))
+    parser.add_argument('--excluded', type=float, default=EXCLUDED,
+                        help='proportion of the excluded files '
+                             '(default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help='seed of the generator (default: %(default)s)')
+
+
+
+#------------------------------------------------------------------------------#
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Generate a synthetic project tree')
+    parser.add_argument('path', help='the tree is (re)created here')
+    arguments(parser)
+    options = parser.parse_args()
+    files   = generate(options.path, options.files,
+                                     options.depth,
+                                     options.fanout,
+                                     options.sizes,
+                                     options.excluded,
+                                     options.seed)
+    print('Generated {} included files in {}'.format(len(files), options.path))
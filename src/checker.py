@@ -2,77 +2,664 @@
 ## INFO ##
 
 # Import python modules
-from os.path import (join,
-                     isfile)
-from pickle  import (dump,
-                     load,
-                     HIGHEST_PROTOCOL)
+from os                 import (stat,
+                                fstat,
+                                utime,
+                                replace)
+from mmap               import (mmap,
+                                ACCESS_READ)
+from os.path            import (join,
+                                getsize,
+                                dirname)
+from pickle             import (dump,
+                                load,
+                                UnpicklingError,
+                                HIGHEST_PROTOCOL)
+from itertools          import islice
+from threading          import local
+from concurrent.futures import (ThreadPoolExecutor,
+                                ProcessPoolExecutor)
+# Only available on some platforms from python 3.8
+try:
+    from mmap import MADV_SEQUENTIAL
+except ImportError:
+    pass
+
+# Import janitor modules
+from table              import Table
+
+
+#------------------------------------------------------------------------------#
+def to_bytes(check_sum):
+    # Some hashers (like pyhashxx) return integers instead of bytes
+    try:
+        return (check_sum & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little')
+    except TypeError:
+        return check_sum
+
+#------------------------------------------------------------------------------#
+def stat_of(file):
+    # Return the part of the stat data which changes when a file is written
+    info = stat(file)
+    return info.st_size, info.st_mtime_ns, info.st_ino
+
+
+
+#------------------------------------------------------------------------------#
+# The hasher of a worker process
+_reader = None
+
+#------------------------------------------------------------------------------#
+def _start_worker(hasher):
+    # Create the hasher of a worker process
+    global _reader
+    _reader = Hasher(hasher)
+
+#------------------------------------------------------------------------------#
+def _consume(file, consumers):
+    # Hash file on a worker process
+    return _reader.consume(file, consumers)
+
+
+
+#------------------------------------------------------------------------------#
+class Hasher:
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, hasher):
+        self._hasher = hasher
+        self._local  = local()
+        # Check if hasher can consume buffers without copying them
+        try:
+            hasher().update(memoryview(b''))
+            self._views = True
+        except TypeError:
+            self._views = False
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def hash(self, file, consumers=()):
+        # NOTE: Every block read is passed to the `update` method of the
+        #       consumers as well, so they do not have to read the file again.
+        #       The blocks can be views of a reused buffer, therefore they
+        #       have to be copied, if they are kept after `update` returns
+        check_sum = self._hasher()
+        update    = check_sum.update
+        with open(file, 'rb') as data:
+            size = fstat(data.fileno()).st_size
+            # If file is small, read it with a single call
+            if size <= Checker.SMALL_SIZE:
+                block = data.read()
+                update(block)
+                for consumer in consumers:
+                    consumer.update(block)
+
+            # If file is huge, let the kernel page it in, and hash it
+            # straight from the mapped memory, without copying it
+            elif size >= Checker.MMAP_SIZE:
+                with mmap(data.fileno(), 0, access=ACCESS_READ) as mapped:
+                    try:
+                        mapped.madvise(MADV_SEQUENTIAL)
+                    except (NameError, AttributeError):
+                        pass
+                    block_size = Checker.MAX_BLOCK_SIZE
+                    with memoryview(mapped) as view:
+                        for i in range(0, len(view), block_size):
+                            self._update(update,
+                                         view[i:i + block_size],
+                                         consumers)
+
+            # Otherwise read it into a buffer which is reused by
+            # every file hashed on this thread, with a block size
+            # growing with the size of the file
+            else:
+                block_size = min(max(size >> 4, Checker.BLOCK_SIZE),
+                                 Checker.MAX_BLOCK_SIZE)
+                try:
+                    buffer = self._local.buffer
+                    if len(buffer) < block_size:
+                        raise AttributeError
+                except AttributeError:
+                    buffer = self._local.buffer = bytearray(block_size)
+                with memoryview(buffer) as view:
+                    view = view[:block_size]
+                    read = data.readinto
+                    size = read(view)
+                    while size:
+                        self._update(update, view[:size], consumers)
+                        size = read(view)
+        return to_bytes(check_sum.digest())
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _update(self, update, view, consumers):
+        # If hasher cannot consume buffers directly, copy them
+        if self._views:
+            update(view)
+        else:
+            update(view.tobytes())
+        for consumer in consumers:
+            consumer.update(view)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def consume(self, file, consumers):
+        # Hash file, feed the consumers with its content,
+        # and return the check_sum and the results of them
+        # NOTE: If the file was removed (or it cannot be read anymore) since
+        #       it was listed, it has no check_sum and no results, and the
+        #       checker forgets it, instead of stopping the whole check
+        try:
+            check_sum = self.hash(file, consumers.values())
+        except OSError:
+            return None, None
+        return check_sum, {name: consumer.finish()
+                               for name, consumer in consumers.items()}
+
 
 
 #------------------------------------------------------------------------------#
 class Checker:
 
-    BLOCK_SIZE = 2**16
-    CACHE_FILE = 'checksum'
+    BLOCK_SIZE     = 2**16
+    MAX_BLOCK_SIZE = 2**22
+    SMALL_SIZE     = 2**20
+    MMAP_SIZE      = 2**26
+    BATCH_SIZE     = 2**8
+    CACHE_FILE     = 'checksum'
+    CLOCK_FILE     = 'clock'
+    JOURNAL_EXT    = '.journal'
+    JOURNAL_SIZE   = 2**22
+    TEMP_EXT       = '.temp'
+
+    # States of a probed file
+    _NEW, _SAME, _TOUCHED, _CHANGED = range(4)
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def dirty(self):
+        return bool(self._changes) or self._compact
+
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def __init__(self, cache_dir,
                        curr_hash_id,
-                       hasher):
+                       hasher,
+                       paranoid=False,
+                       jobs=1,
+                       processes=False,
+                       git=None,
+                       stats=None):
         # Store static values
         self._hash_id   = curr_hash_id
         self._hasher    = hasher
+        self._reader    = Hasher(hasher)
+        self._paranoid  = paranoid
+        self._jobs      = jobs
+        self._processes = processes
+        self._git       = git
+        self._stats     = stats
+        self._executor  = None
+        self._since     = None
         self._cache_dir = cache_dir
-        self._cache     = cache = {}
+        self._table     = None
+        self._cache     = {}
+        self._seen      = set()
+        self._kept      = set()
+        self._pending   = {}
+        self._changes   = {}
+        self._vanished  = []
+        self._compact   = True
 
         # If a cache file already exists
+        legacy = False
         try:
-            with open(join(cache_dir, Checker.CACHE_FILE), mode='rb') as cache_file:
-                prev_hash_id, cache_data = load(cache_file)
-                if prev_hash_id != curr_hash_id:
-                    return
-                for file, check_sum in cache_data.items():
-                    # If file still exists
-                    if isfile(file):
-                        cache[file] = check_sum
+            snapshot = join(cache_dir, Checker.CACHE_FILE)
+            with open(snapshot, mode='rb') as cache_file:
+                identity = Checker._identity(curr_hash_id, cache_file.fileno())
+                # Map the table of the entries, which
+                # are looked up only when they are needed
+                try:
+                    self._table = Table(cache_file)
+                    if self._table.hash_id != curr_hash_id:
+                        self._table.close()
+                        self._table = None
+                        return
+                # If cache was written in the old pickle format, load it
+                # into the memory, and write it as a table on next save
+                except Table.InvalidFormat:
+                    cache_file.seek(0)
+                    prev_hash_id, cache_data = load(cache_file)
+                    if prev_hash_id != curr_hash_id:
+                        return
+                    for file, entry in cache_data.items():
+                        # If cache was written before the stat data was
+                        # stored next to the check_sum, force a hash
+                        if not isinstance(entry, tuple):
+                            entry = entry, None
+                        self._cache[file] = to_bytes(entry[0]), entry[1]
+                    legacy = True
         # IF this is the first time Checker is running
-        except (FileNotFoundError, EOFError):
+        except (FileNotFoundError, EOFError, UnpicklingError):
+            return
+
+        # If the journal belongs to this snapshot, replay the changes
+        # stored since the snapshot was written, until the end of the
+        # journal or a torn record, which could be left by a crash
+        try:
+            with open(snapshot + Checker.JOURNAL_EXT, mode='rb') as journal:
+                if load(journal) == identity:
+                    cache    = self._cache
+                    position = journal.tell()
+                    try:
+                        while True:
+                            cache.update(load(journal))
+                            position = journal.tell()
+                    # If journal was read to its end, new changes can be
+                    # appended to it, otherwise a new snapshot is needed
+                    except (EOFError, UnpicklingError, ValueError):
+                        self._compact = (position !=
+                                         fstat(journal.fileno()).st_size)
+        except (FileNotFoundError, EOFError, UnpicklingError, ValueError):
             pass
+        self._compact |= legacy
+
+        # NOTE: Entries of files which do not exist anymore are
+        #       not looked for here, as that would cost a stat call
+        #       per entry, instead they are dropped by `prune`
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def _identity(hash_id, descriptor):
+        # Return what identifies a snapshot: a new snapshot is written
+        # to a new file, so at least its inode will be different
+        info = fstat(descriptor)
+        return hash_id, info.st_ino, info.st_size, info.st_mtime_ns
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def hash(self, file):
-        check_sum  = self._hasher()
-        block_size = Checker.BLOCK_SIZE
-        with open(file, 'rb') as data:
-            buffer = data.read(block_size)
-            while buffer:
-                check_sum.update(buffer)
-                buffer = data.read(block_size)
-        return check_sum.digest()
+        return self._reader.hash(file)
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def update(self, files):
-        hash  = self.hash
-        cache = self._cache
+        hash    = self.hash
+        cache   = self._cache
+        pending = self._pending
         for file in files:
-            cache[file] = hash(file)
+            try:
+                # Stat before hashing, so if the file is written in the
+                # meantime, the next check will not trust the stored stat
+                status = stat_of(file)
+                # If the file was hashed by `is_changed` and it has not
+                # been written since then, use that check_sum instead
+                try:
+                    check_sum, prev_status = pending.pop(file)
+                    if status != prev_status:
+                        raise KeyError
+                except KeyError:
+                    check_sum = hash(file)
+                    if self._stats is not None:
+                        self._stats.count('hashed')
+                        self._stats.count('bytes', status[0])
+            # If the file was removed in the meantime
+            except OSError:
+                self.vanish(file)
+                continue
+            cache[file] = self._changes[file] = (check_sum,
+                                                 self._trusted(status))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _now(self):
+        # Return the current time of the file system (in the resolution of
+        # its timestamps), which is the new mtime of a touched file
+        clock = join(self._cache_dir, Checker.CLOCK_FILE)
+        with open(clock, mode='ab'):
+            pass
+        utime(clock)
+        return stat(clock).st_mtime_ns
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _trusted(self, status):
+        # NOTE: If a file was written at (or after) the time when the check
+        #       started, it could be written again after it was read, within
+        #       the same tick of the clock and with the same size, without
+        #       changing its stat data, so its stat data is not stored, and
+        #       it is hashed again by the next check (like the racily clean
+        #       entries of the index of git)
+        if self._since is None:
+            self._since = self._now()
+        if (status is not None and
+            status[1] >= self._since):
+                return None
+        return status
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _lookup(self, file):
+        # NOTE: The in-memory cache holds the entries changed since the
+        #       table was written, where None marks a forgotten file
+        try:
+            return self._cache[file]
+        except KeyError:
+            if self._table is not None:
+                return self._table.get(file)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def files(self, prefix=''):
+        # Yield all the files (starting with prefix) which have an entry
+        cache = self._cache
+        if self._table is not None:
+            for file in self._table.paths(prefix):
+                if file not in cache:
+                    yield file
+        for file, entry in cache.items():
+            if (entry is not None and
+                file.startswith(prefix)):
+                    yield file
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def check_sum(self, file):
+        # Return the latest known check_sum of file
+        try:
+            return self._pending[file][0]
+        except KeyError:
+            entry = self._lookup(file)
+            if entry is not None:
+                return entry[0]
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def forget(self, paths):
+        cache     = self._cache
+        changes   = self._changes
+        pending   = self._pending
+        forgotten = []
+        for path in paths:
+            pending.pop(path, None)
+            # If path is a file
+            if self._lookup(path) is not None:
+                forgotten.append(path)
+            # If path is a folder, forget everything inside it
+            else:
+                forgotten.extend(self.files(join(path, '')))
+        for file in forgotten:
+            cache[file] = changes[file] = None
+        # Return the forgotten files
+        return forgotten
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def vanish(self, file):
+        # Forget file, which was removed (or became unreadable)
+        # after it was listed, but before it could be read
+        self._seen.discard(file)
+        self.forget((file,))
+        if file not in self._vanished:
+            self._vanished.append(file)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def vanished(self):
+        # Return the files forgotten by the checks since the last call
+        vanished, self._vanished = self._vanished, []
+        return vanished
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def keep(self, folders):
+        # Consider every file inside the folders as checked and unchanged,
+        # so `prune` does not forget them, without looking at any of them
+        self._kept.update(folders)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _is_kept(self, file):
+        kept   = self._kept
+        folder = dirname(file)
+        while folder not in kept:
+            parent = dirname(folder)
+            if parent == folder:
+                return False
+            folder = parent
+        return True
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def prune(self):
+        # NOTE: This method should only be called after all the
+        #       files were walked through, as it forgets every file
+        #       which was not checked since the last pruning
+        seen      = self._seen
+        cache     = self._cache
+        changes   = self._changes
+        is_kept   = self._is_kept if self._kept else (lambda file: False)
+        forgotten = [f for f in self.files()
+                         if f not in seen and not is_kept(f)]
+        for file in forgotten:
+            cache[file] = changes[file] = None
+        self._seen = set()
+        self._kept = set()
+        # Return the forgotten files
+        return forgotten
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def rebuild(self):
-        self._cache = {}
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+        self._cache   = {}
+        self._pending = {}
+        self._changes = {}
+        self._compact = True
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _probe(self, file, status):
+        # Return the entry of the file, and whether the file has to be hashed:
+        # if it has never been seen before, or its stat data changed, or
+        # janitor is running in paranoid mode, otherwise it is considered
+        # as unchanged without reading it
+        entry = self._lookup(file)
+        return entry, (entry is None or
+                       entry[1] != status or
+                       self._paranoid)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def _state(entry, check_sum):
+        if entry is None:
+            return Checker._NEW
+        elif entry[0] != check_sum:
+            return Checker._CHANGED
+        # If only the stat data changed (for example the file was touched),
+        # store the new one, so the next check can use the fast path again
+        return Checker._TOUCHED
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _apply(self, file, state, check_sum, status):
+        self._seen.add(file)
+        # If file changed, keep the new check_sum for `update`
+        if state is Checker._SAME:
+            return False
+        elif state is Checker._TOUCHED:
+            self._cache[file] = self._changes[file] = (check_sum,
+                                                       self._trusted(status))
+            return False
+        self._pending[file] = check_sum, status
+        return True
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def is_changed(self, file):
-        # Return wether check_sum differs or not
-        return not self._cache.get(file, -1.0) == self.hash(file)
+        status = stat_of(file)
+        entry, stale = self._probe(file, status)
+        if not stale:
+            return self._apply(file, Checker._SAME, None, None)
+        check_sum = self.hash(file)
+        return self._apply(file, Checker._state(entry, check_sum),
+                           check_sum, status)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _map(self, files, consumers):
+        # Return an iterator of the check_sums of the files and the results
+        # of their consumers, in the same order as the files were passed
+        if self._jobs == 1:
+            return map(self._reader.consume, files, consumers)
+
+        # Create the pool if this is the first parallel check
+        if self._executor is None:
+            if self._processes:
+                self._executor = ProcessPoolExecutor(max_workers=self._jobs,
+                                                     initializer=_start_worker,
+                                                     initargs=(self._hasher,))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self._jobs)
+
+        # Send files to the processes in chunks, so a process does not
+        # have to wait for the next file after each one, but the chunks
+        # are small enough to keep all the processes busy
+        if self._processes:
+            return self._executor.map(_consume, files, consumers,
+                                      chunksize=max(len(files)//(self._jobs*4),
+                                                    1))
+        return self._executor.map(self._reader.consume, files, consumers)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def changed(self, entries, consumers=None):
+        # NOTE: entries are expected to have a `path` and a `status`
+        #       attribute, like the ones produced by `walker.walk`
+
+        # NOTE: If `consumers` is passed, it is called with each entry, and
+        #       it should return a dictionary of consumers, which will be fed
+        #       with the content of the file, if the file has to be read for
+        #       hashing (so every changed file is read only once). In this
+        #       case the changed entries are yielded with the dictionary of
+        #       the results of their consumers (returned by their `finish`)
+        create  = consumers or (lambda entry: {})
+        probe   = self._probe
+        apply   = self._apply
+        vanish  = self.vanish
+        git     = self._git
+        stats   = self._stats
+        entries = iter(entries)
+        # Every file is read after this, so the ones written
+        # at or after this time are not trusted by the next check
+        self._since = self._now()
+        # If git is used, check whether the index changed since last time
+        if git is not None:
+            git.reload()
+        # Check files batch by batch, so the walk does not have to finish
+        # before the first files can be processed, and yield the changed
+        # files in the same order as they were passed
+        while True:
+            batch = list(islice(entries, Checker.BATCH_SIZE))
+            if not batch:
+                return
+            stale = []
+            same  = 0
+            for entry in batch:
+                status = entry.status
+                # If the stat data was not collected during the walk
+                if status is None:
+                    try:
+                        status = stat_of(entry.path)
+                    except OSError:
+                        vanish(entry.path)
+                        continue
+                cached, hashed = probe(entry.path, status)
+                if not hashed:
+                    apply(entry.path, Checker._SAME, None, None)
+                    same += 1
+                    continue
+                # If git knows the content of the file, use the id of
+                # that instead of the check_sum, and do not read the file
+                check_sum = None
+                if git is not None:
+                    check_sum = git.check_sum(entry.path, status)
+                stale.append((entry, status, cached, check_sum))
+
+            # Hash the files (and feed their consumers) on
+            # the threads or the processes if there are any
+            unknown = [item[0] for item in stale if item[3] is None]
+            if stats is not None:
+                stats.count('unread', same)
+                stats.count('git', len(stale) - len(unknown))
+                stats.count('hashed', len(unknown))
+                stats.count('bytes', sum(item[1][0] for item in stale
+                                                        if item[3] is None))
+            results = self._map([entry.path for entry in unknown],
+                                [create(entry) for entry in unknown])
+            for entry, status, cached, check_sum in stale:
+                result = {}
+                if check_sum is None:
+                    check_sum, result = next(results)
+                    # If the file was removed since it was listed
+                    if check_sum is None:
+                        vanish(entry.path)
+                        continue
+                if apply(entry.path,
+                         Checker._state(cached, check_sum),
+                         check_sum,
+                         status):
+                    yield (entry, result) if consumers else entry
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
     def to_file(self):
-        # Serialize cache and save it to the cache dir
-        with open(join(self._cache_dir, Checker.CACHE_FILE), mode='wb') as cache_file:
-            dump((self._hash_id, self._cache), cache_file, HIGHEST_PROTOCOL)
+        snapshot = join(self._cache_dir, Checker.CACHE_FILE)
+        journal  = snapshot + Checker.JOURNAL_EXT
+        # If the journal is small enough, only append the changes to it
+        if not self._compact:
+            try:
+                if getsize(journal) <= Checker.JOURNAL_SIZE:
+                    with open(journal, mode='ab') as journal_file:
+                        dump(self._changes, journal_file, HIGHEST_PROTOCOL)
+                    self._changes = {}
+                    return
+            except FileNotFoundError:
+                pass
+
+        # Merge the table and the changes, write them as a new table
+        # to the cache dir, then start a new journal, which belongs to it
+        cache   = self._cache
+        entries = [(file, entry) for file, entry in cache.items()
+                                     if entry is not None]
+        if self._table is not None:
+            entries.extend((file, entry) for file, entry in self._table.items()
+                                             if file not in cache)
+        temporary = snapshot + Checker.TEMP_EXT
+        with open(temporary, mode='wb') as cache_file:
+            Table.write(cache_file, self._hash_id, entries)
+            cache_file.flush()
+            identity = Checker._identity(self._hash_id, cache_file.fileno())
+        replace(temporary, snapshot)
+        with open(journal, mode='wb') as journal_file:
+            dump(identity, journal_file, HIGHEST_PROTOCOL)
+
+        # Use the new table from now on
+        if self._table is not None:
+            self._table.close()
+        with open(snapshot, mode='rb') as cache_file:
+            self._table = Table(cache_file)
+        self._cache   = {}
+        self._changes = {}
+        self._compact = False
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+## INFO ##
+## INFO ##
+
+# NOTE: The client only imports what it needs to talk to the daemon, so it
+#       starts faster than janitor itself, which is the point of the daemon
+
+# Import python modules
+from sys         import (argv,
+                         exit,
+                         stderr)
+from json        import (dumps,
+                         loads)
+from os          import (getcwd,
+                         EX_USAGE,
+                         EX_SOFTWARE,
+                         EX_UNAVAILABLE)
+from os.path     import (join,
+                         abspath,
+                         expanduser,
+                         expandvars)
+from socket      import (socket,
+                         AF_UNIX,
+                         SOCK_STREAM)
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+_SOCKET  = join('.janitor', 'socket')
+_TIMEOUT = 60.0
+_USAGE   = '''usage: client.py [--path=PATH] [--json] COMMAND [ARGUMENT]...
+
+commands:
+    changed [SINCE]   files changed and removed after generation SINCE
+    tags [WORD]...    collected tags (of the given words only)
+    status            work path, process id and generation of the daemon
+    stop              stops the daemon'''
+
+
+
+#------------------------------------------------------------------------------#
+def ask(path, request):
+    # Send request to the daemon serving path, and return its response
+    client = socket(AF_UNIX, SOCK_STREAM)
+    client.settimeout(_TIMEOUT)
+    try:
+        client.connect(join(path, _SOCKET))
+        client.sendall(dumps(request).encode('utf-8') + b'\n')
+        data = []
+        while True:
+            block = client.recv(2**16)
+            if not block:
+                break
+            data.append(block)
+    finally:
+        client.close()
+    return loads(b''.join(data).decode('utf-8'))
+
+
+
+#------------------------------------------------------------------------------#
+def main(*arguments):
+    path      = getcwd()
+    raw       = False
+    arguments = list(arguments)
+    while (arguments and
+           arguments[0].startswith('--')):
+        option, _, value = arguments.pop(0).partition('=')
+        if option == '--path' and value:
+            path = abspath(expanduser(expandvars(value)))
+        elif option == '--json':
+            raw = True
+        else:
+            print(_USAGE, file=stderr)
+            return EX_USAGE
+    if not arguments:
+        print(_USAGE, file=stderr)
+        return EX_USAGE
+
+    # Build the request
+    command, *values = arguments
+    request = {'command': command}
+    try:
+        if command == 'changed':
+            if values:
+                request['since'] = int(values[0])
+        elif command == 'tags':
+            if values:
+                request['words'] = values
+    except ValueError:
+        print(_USAGE, file=stderr)
+        return EX_USAGE
+
+    try:
+        response = ask(path, request)
+    except OSError as e:
+        print('Cannot reach the daemon of {!r}: {}'.format(path, e), file=stderr)
+        return EX_UNAVAILABLE
+    if 'error' in response:
+        print(response['error'], file=stderr)
+        return EX_SOFTWARE
+
+    # Print the response
+    if raw:
+        print(dumps(response))
+    elif command == 'changed':
+        print('generation', response['generation'])
+        for file in response['changed']:
+            print('changed', file)
+        for file in response['removed']:
+            print('removed', file)
+    elif command == 'tags':
+        for file, tags in response['tags'].items():
+            for line, word, text in tags:
+                print('{}:{}: {}: {}'.format(file, line, word, text))
+    else:
+        for key, value in response.items():
+            print(key, value)
+    return 0
+
+
+
+#------------------------------------------------------------------------------#
+if __name__ == '__main__':
+    exit(main(*argv[1:]))
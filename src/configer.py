@@ -37,6 +37,16 @@ _DEFAULT        = OrderedDict(
                                                         'pyc', 'pyo', 'jpg',
                                                         'jpeg', 'png', 'gif',
                                                         'pdf')))),
+        ('gitignore'         , (bool, False)),
+    ])),
+
+    # NOTE: The files inside the `summarize`d folders are only checked, if
+    #       a file was added to, removed from or renamed in their folder,
+    #       so it should only contain folders (like the ones of vendored
+    #       sources or assets) which are never changed in any other way
+    ('checker', OrderedDict(
+    [
+        ('summarize'         , (OrderedSet, OrderedSet())),
     ])),
 
     ('versioner', OrderedDict(
@@ -58,6 +68,7 @@ _DEFAULT        = OrderedDict(
         ('exclude'           , (OrderedDict, OrderedDict())),
         ('words'             , (OrderedSet, Tagger.WORDS)),
         ('marks'             , (OrderedDict, Tagger.MARKS)),
+        ('database'          , (bool, False)),
     ])),
 
     ('prefixer', OrderedDict(
@@ -67,7 +78,7 @@ _DEFAULT        = OrderedDict(
         ('tag'               , (str, Prefixer.TAG)),
         ('align'             , (str, Prefixer.ALIGN_LEFT)),
         ('width'             , (int, Prefixer.WIDTH)),
-        ('block'             , (int, Prefixer.BLOCK)),
+        ('block'             , (str, Prefixer.BLOCK)),
     ])),
 ])
 
@@ -0,0 +1,280 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os          import (unlink,
+                         getpid)
+from os.path     import join
+from json        import (dumps,
+                         loads)
+from time        import perf_counter
+from select      import select
+from socket      import (socket,
+                         timeout,
+                         AF_UNIX,
+                         SOCK_STREAM)
+from collections import OrderedDict
+
+
+#------------------------------------------------------------------------------#
+class Daemon:
+
+    # NOTE: The daemon does not have a loop of its own, it is the waiting
+    #       step of the watch loop: while there are no changes, it answers
+    #       the queries. If a query arrives while there are changes not
+    #       checked yet, the query is answered after the next cycle, so the
+    #       answers are always up to date. Each request is a single line of
+    #       JSON, answered by a single line of JSON, and the connection is
+    #       closed afterwards, so clients do not have to keep anything open:
+    #
+    #           {"command": "changed", "since": 3}
+    #           {"generation": 5, "changed": [...], "removed": [...]}
+    #
+    #       Every cycle increases the generation, so a client can ask for the
+    #       files changed since the last generation it has seen
+
+    # Class level constants
+    SOCKET      = 'socket'
+    BACKLOG     = 16
+    TIMEOUT     = 1.0
+    MAX_REQUEST = 2**16
+    COMMANDS    = 'changed', 'tags', 'status', 'stop'
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class Unavailable(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def socket_of(cache_dir):
+        return join(cache_dir, Daemon.SOCKET)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, session):
+        self._session    = session
+        self._path       = path = Daemon.socket_of(session.cache_dir)
+        self._generation = 0
+        self._changed    = {}
+        self._removed    = {}
+        self._pending    = []
+        self.stopped     = False
+
+        # If the socket exists, but nothing is listening on it,
+        # it was left behind by a daemon, which did not stop cleanly
+        probe = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise Daemon.Unavailable('another daemon is serving '
+                                     '{!r}'.format(session.path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            try:
+                unlink(path)
+            except FileNotFoundError:
+                pass
+        except OSError as e:
+            raise Daemon.Unavailable(str(e)) from None
+        finally:
+            probe.close()
+
+        self._socket = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            self._socket.bind(path)
+            self._socket.listen(Daemon.BACKLOG)
+        except OSError as e:
+            self._socket.close()
+            raise Daemon.Unavailable(str(e)) from None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def record(self, result):
+        # Start a new generation with the result of a cycle
+        self._generation += 1
+        generation = self._generation
+        changed    = self._changed
+        removed    = self._removed
+        for file in result.files:
+            removed.pop(file.path, None)
+            changed[file.path] = generation
+        for file in result.forgotten:
+            changed.pop(file, None)
+            removed[file] = generation
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _forget(self, files):
+        # Forget the removed files, and record them in the current
+        # generation, as there will be no result containing them
+        forgotten = self._session.forget(files)
+        for file in forgotten:
+            self._changed.pop(file, None)
+            self._removed[file] = self._generation + 1
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def wait(self, watcher=None, time=None):
+        # Answer the queries until there are changes, and return the entries
+        # to check and whether they are all the files, or None if the daemon
+        # was asked to stop. If there is no watcher, every file is checked
+        # after time seconds, or when a query arrives
+        session = self._session
+        for connection, request in self._pending:
+            self._reply(connection, request)
+        self._pending = []
+
+        sources  = [self._socket] + ([watcher] if watcher is not None else [])
+        deadline = None if watcher is not None else perf_counter() + time
+        while not self.stopped:
+            remaining = (None if deadline is None else
+                         max(deadline - perf_counter(), 0))
+            readable  = select(sources, (), (), remaining)[0]
+            # If there are changes reported by the watcher
+            if watcher in readable:
+                files, whole, removed = session.changes(watcher)
+                self._forget(removed)
+                return files, whole
+            # If it is time to poll
+            if not readable:
+                return session.walk(), True
+
+            connection, request = self._accept()
+            if request is None:
+                continue
+            # If there are changes, which were not checked yet, answer
+            # the query after they were checked in the next cycle
+            if request.get('command') == 'changed':
+                if watcher is None:
+                    self._pending.append((connection, request))
+                    return session.walk(), True
+                if select((watcher,), (), (), 0)[0]:
+                    self._pending.append((connection, request))
+                    files, whole, removed = session.changes(watcher)
+                    self._forget(removed)
+                    return files, whole
+            self._reply(connection, request)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _accept(self):
+        # Return the connection and the request of a client, or None for
+        # both of them, if the request could not be read or it is invalid
+        connection, _ = self._socket.accept()
+        connection.settimeout(Daemon.TIMEOUT)
+        data = b''
+        try:
+            while (b'\n' not in data and
+                   len(data) < Daemon.MAX_REQUEST):
+                block = connection.recv(Daemon.MAX_REQUEST)
+                if not block:
+                    break
+                data += block
+            request = loads(data.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('request is not an object')
+        except (timeout, OSError):
+            connection.close()
+            return None, None
+        except ValueError as e:
+            self._send(connection, {'error': 'invalid request: {}'.format(e)})
+            return None, None
+        return connection, request
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _send(self, connection, response):
+        try:
+            connection.sendall(dumps(response).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _reply(self, connection, request):
+        try:
+            response = self._answer(request)
+        except (TypeError, ValueError) as e:
+            response = {'error': 'invalid request: {}'.format(e)}
+        # NOTE: Whatever goes wrong while answering a single
+        #       request, a client should not be able to stop
+        #       the daemon, so the error is only sent back
+        except Exception as e:
+            response = {'error': 'cannot answer request: {}: {}'.format(
+                                     type(e).__name__, e)}
+        self._send(connection, response)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def _strings(request, key):
+        # Return the list of strings of the request at key, or None
+        value = request.get(key)
+        if (value is not None and
+            (not isinstance(value, list) or
+             not all(isinstance(item, str) for item in value))):
+                raise TypeError('{!r} should be a list of '
+                                'strings'.format(key))
+        return value
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _answer(self, request):
+        command = request.get('command')
+        if command not in Daemon.COMMANDS:
+            return {'error': 'unknown command {!r}, it should be one of: '
+                             '{}'.format(command, ', '.join(Daemon.COMMANDS))}
+
+        # The files changed and removed after the given generation
+        if command == 'changed':
+            since = request.get('since', 0)
+            if (not isinstance(since, int) or
+                isinstance(since, bool)):
+                    raise TypeError("'since' should be an integer")
+            return OrderedDict((
+                ('generation', self._generation),
+                ('changed'   , sorted(file for file, generation
+                                          in self._changed.items()
+                                          if generation > since)),
+                ('removed'   , sorted(file for file, generation
+                                          in self._removed.items()
+                                          if generation > since)),
+            ))
+
+        # The collected tags of the given files (or of every file),
+        # which contain any of the given words (or every tag)
+        elif command == 'tags':
+            tagger = self._session.tagger
+            if tagger is None:
+                return {'error': 'the tagger is not used'}
+            files = self._strings(request, 'files')
+            words = {word.lower() for word in
+                        self._strings(request, 'words') or ()}
+            found = OrderedDict()
+            for file, tags in tagger.tags(files):
+                tags = [tag for tag in tags
+                            if not words or tag.word.lower() in words]
+                if tags:
+                    found[file] = tags
+            return {'tags': found}
+
+        elif command == 'status':
+            return OrderedDict((('path'      , self._session.path),
+                                ('pid'       , getpid()),
+                                ('generation', self._generation)))
+
+        # command == 'stop'
+        self.stopped = True
+        return {'stopped': True}
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        for connection, _ in self._pending:
+            connection.close()
+        self._pending = []
+        self._socket.close()
+        try:
+            unlink(self._path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,181 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os          import (stat,
+                         fsdecode)
+from os.path     import (join,
+                         isdir,
+                         isfile,
+                         dirname,
+                         abspath)
+from struct      import Struct
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+_SIGNATURE    = b'DIRC'
+_HEADER       = Struct('>4sII')
+# ctime, mtime, dev, ino, mode, uid, gid, size (only the used ones are named)
+_STAT         = Struct('>8xII4xI12xI')
+_STAT_SIZE    = 40
+_FLAGS        = Struct('>H')
+_NAME_MASK    = 0x0FFF
+_STAGE_MASK   = 0x3000
+_VALID        = 0x8000
+_EXTENDED     = 0x4000
+_SKIP_OR_ADD  = 0x6000
+_LOW_32       = 0xFFFFFFFF
+_NANO         = 10**9
+
+
+
+#------------------------------------------------------------------------------#
+def find_repository(path):
+    # Return the work tree and the git directory of
+    # the repository containing path, or None for both
+    path = abspath(path)
+    while True:
+        git = join(path, '.git')
+        if isdir(git):
+            return path, git
+        # If path is a linked worktree or a submodule
+        if isfile(git):
+            with open(git) as file:
+                line = file.readline().strip()
+            if line.startswith('gitdir:'):
+                return path, join(path, line[7:].strip())
+        parent = dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+
+
+
+#------------------------------------------------------------------------------#
+class GitIndex:
+
+    # NOTE: A tracked file is clean, if its stat data is the same as the one
+    #       stored in the index, so its content is the blob in the index, and
+    #       its object id can be used as its check_sum, without reading it
+
+    # Class level constants
+    PREFIX = b'git:'
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class Unavailable(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path):
+        # NOTE: The paths in the index are relative to the work tree, which
+        #       is the folder containing the `.git` folder (or file, in case
+        #       of a linked worktree or a submodule)
+        self._root, git_dir = find_repository(path)
+        if git_dir is None:
+            raise GitIndex.Unavailable('{!r} is not inside a git '
+                                       'repository'.format(path))
+        self._file     = join(git_dir, 'index')
+        self._oid_size = 20
+        try:
+            with open(join(git_dir, 'config')) as file:
+                for line in file:
+                    key, _, value = line.partition('=')
+                    if (key.strip().lower() == 'objectformat' and
+                        value.strip().lower() == 'sha256'):
+                            self._oid_size = 32
+        except OSError:
+            pass
+        self._identity = None
+        self._entries  = {}
+        self.reload()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def reload(self):
+        # Read the index again, if it was written since it was last read
+        try:
+            info = stat(self._file)
+        except OSError as e:
+            raise GitIndex.Unavailable(str(e)) from None
+        identity = info.st_ino, info.st_size, info.st_mtime_ns
+        if identity == self._identity:
+            return
+        with open(self._file, mode='rb') as file:
+            data = file.read()
+        self._entries  = self._parse(data, info.st_mtime_ns)
+        self._identity = identity
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _parse(self, data, index_mtime):
+        signature, version, count = _HEADER.unpack_from(data)
+        if (signature != _SIGNATURE or
+            version not in (2, 3, 4)):
+                raise GitIndex.Unavailable('unsupported index format '
+                                           '(version {})'.format(version))
+        entries  = {}
+        root     = self._root
+        oid_size = self._oid_size
+        fixed    = _STAT_SIZE + oid_size + _FLAGS.size
+        offset   = _HEADER.size
+        previous = b''
+        for _ in range(count):
+            mtime_s, mtime_ns, ino, size = _STAT.unpack_from(data, offset)
+            oid_end  = offset + _STAT_SIZE + oid_size
+            oid      = data[offset + _STAT_SIZE:oid_end]
+            flags,   = _FLAGS.unpack_from(data, oid_end)
+            position = offset + fixed
+            extended = 0
+            if flags & _EXTENDED:
+                extended, = _FLAGS.unpack_from(data, position)
+                position += _FLAGS.size
+
+            # In version 4 paths are prefix compressed: the number of bytes
+            # to remove from the end of the previous path, then the suffix
+            if version == 4:
+                byte      = data[position]
+                position += 1
+                strip     = byte & 0x7F
+                while byte & 0x80:
+                    byte      = data[position]
+                    position += 1
+                    strip     = ((strip + 1) << 7) | (byte & 0x7F)
+                end    = data.index(b'\0', position)
+                name   = previous[:len(previous) - strip] + data[position:end]
+                offset = end + 1
+            # Otherwise paths are NUL terminated, and entries are padded
+            else:
+                length = flags & _NAME_MASK
+                if length == _NAME_MASK:
+                    length = data.index(b'\0', position) - position
+                name   = data[position:position + length]
+                offset += (position - offset + length + 8) & ~7
+            previous = name
+
+            # Only trust entries, which are merged, not marked as valid or
+            # skipped by the user, and which are not racily clean: a file
+            # modified in the same time the index was written could have
+            # the same stat data with a different content
+            mtime = mtime_s*_NANO + mtime_ns
+            if (flags & (_STAGE_MASK | _VALID) or
+                extended & _SKIP_OR_ADD or
+                mtime >= index_mtime):
+                    continue
+            entries[join(root, fsdecode(name))] = mtime, size, ino, oid
+        return entries
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def check_sum(self, file, status):
+        # Return the object id of file, if it is tracked and clean, otherwise
+        # None, status is the (st_size, st_mtime_ns, st_ino) triplet of file
+        try:
+            mtime, size, ino, oid = self._entries[file]
+        except KeyError:
+            return
+        # NOTE: Sizes and inodes are truncated to 32 bits in the index
+        if (status[1] == mtime and
+            status[0] & _LOW_32 == size and
+            status[2] & _LOW_32 == ino):
+                return GitIndex.PREFIX + oid
@@ -6,11 +6,9 @@
 from textwrap    import wrap
 from time        import sleep
 from sys         import (argv,
-                         exit,
-                         stderr)
+                         exit)
 from shutil      import rmtree
-from os          import (walk,
-                         chdir,
+from os          import (chdir,
                          getcwd,
                          makedirs,
                          EX_USAGE,
@@ -18,45 +16,52 @@ from os          import (walk,
 from os.path     import (join,
                          isdir,
                          abspath,
-                         splitext,
-                         basename,
+                         dirname,
+                         normpath,
                          expanduser,
                          expandvars)
 from collections import OrderedDict
-from subprocess  import check_output
+from subprocess  import (DEVNULL,
+                         check_output,
+                         CalledProcessError)
 
 # Import janitor modules
-from checker           import Checker
+from session           import Session
+from daemon            import Daemon
+from tagstore          import TagStore
+from stats             import Stats
+from logger            import Logger
+from watcher           import Watcher
 from configer          import Configer
-from modules.tagger    import Tagger
 from modules.prefixer  import Prefixer
 from modules.versioner import Versioner
 
 
-# TODO: If `janitor` not running in a terminal, remove colors
-#       To detect this, use the `os.isatty()` function
-
 # Module level constants
 _MARKER        = '==> '
 _INDENT        = ' '*4
 _JPRINT        = '\033[32;1m{}\033[37mjanitor:\033[0m'.format(_MARKER)
 _JERROR        = '\033[31;1m{}\033[37mjanitor: \033[31mError:\033[0m'.format(_MARKER)
-_CACHE_DIR     = '.janitor'
+_CACHE_DIR     = Session.CACHE_DIR
 _MODULES       = 'versioner', 'tagger', 'prefixer'
 _MOD_USE_FILE  = _MODULES[1:]
 _MOD_NAME_LEN  = len(max(*_MOD_USE_FILE, key=len)) + 1
 _SKIP          = '{{}}\033[37;1m{{:<{}}}\033[33m skips\033[37m:\033[0m '.format(_MOD_NAME_LEN)
 _USE           = '{{}}\033[37;1m{{:<{}}}\033[32m uses\033[37m:\033[0m  '.format(_MOD_NAME_LEN)
-_BOOL_LONG     = ('default', 'generate', 'help', 'kill', 'md5',
-                  'rebuild', 'sha', 'update', 'version', 'watch')
-_WORD_LONG     = 'config', 'path', 'time'
-_SPEC_LONG     = 'exclude', 'increase'
+_QUERY         = '{}\033[37;1m{}\033[37m:{}:\033[36m {}\033[37m:\033[0m'
+_TAG           = '{}\033[37m{:>5}:\033[36m {}\033[37m:\033[0m'
+_BOOL_LONG     = ('daemon', 'default', 'generate', 'git', 'help', 'kill',
+                  'md5', 'paranoid', 'processes', 'rebuild', 'sha', 'update',
+                  'version', 'watch')
+_WORD_LONG     = 'config', 'jobs', 'path', 'time', 'verbosity'
+_SPEC_LONG     = 'exclude', 'increase', 'query'
+_OPT_LONG      = 'stats',
 _SPEC_VALID    = {'exclude' : {'tagger', 'prefixer', 'versioner'},
                   'increase': {Versioner.INC_MAJOR,
                                Versioner.INC_MINOR,
                                Versioner.INC_MAINTENANCE,
                                Versioner.INC_BUILD}}
-_ARGS_ALL      = set(_BOOL_LONG + _WORD_LONG + _SPEC_LONG)
+_ARGS_ALL      = set(_BOOL_LONG + _WORD_LONG + _SPEC_LONG + _OPT_LONG)
 _SHORT_TO_LONG = {
     'c': 'config'  , 'C': 'config',
     'd': 'default' , 'D': 'default',
@@ -64,9 +69,11 @@ _SHORT_TO_LONG = {
     'g': 'generate', 'G': 'generate',
     'h': 'help'    , 'H': 'help',
     'i': 'increase', 'I': 'increase',
+    'j': 'jobs'    , 'J': 'jobs',
     'k': 'kill'    , 'K': 'kill',
     'm': 'md5'     , 'M': 'md5',
     'p': 'path'    , 'P': 'path',
+    'q': 'query'   , 'Q': 'query',
     'r': 'rebuild' , 'R': 'rebuild',
     's': 'sha'     , 'S': 'sha',
     't': 'time'    , 'T': 'time',
@@ -115,6 +122,22 @@ _HELP = OrderedDict((
             "useful, when for example the `prefixer`'s block is changed, so it "
             'needs to be updated in all files.'),
 
+        ('\033[37;1m--paranoid\033[0m',
+            'By default, janitor will consider a file unchanged, if its size, '
+            'modification time and inode are the same as they were when the '
+            'file was last hashed, without reading the file. By defining this '
+            'argument, janitor will hash every file on every check instead.'),
+
+        ('\033[37;1m--git\033[0m',
+            'If the work path is inside a git repository, janitor will read '
+            "the repository's index, and it will not read the tracked files, "
+            'which are clean according to git (their stat data is the same '
+            'as the one in the index), but it will use their object ids '
+            'instead of their check_sums. This is useful, right after the '
+            'cloning/syncing from the repository, as only the files which '
+            'are untracked, modified or really changed by the sync are read. '
+            'This argument is ignored, if `--paranoid` is defined.'),
+
         ('\033[37;1m-S\033[0m, '
          '\033[37;1m-s\033[0m, '
          '\033[37;1m--sha\033[0m',
@@ -141,14 +164,59 @@ _HELP = OrderedDict((
         ('\033[37;1m-W\033[0m, '
          '\033[37;1m-w\033[0m, '
          '\033[37;1m--watch\033[0m',
-            'Constantly running and checking for changes.'),
+            'Constantly running and checking for changes. On Linux the '
+            'changed files are reported by inotify, so only those are checked, '
+            'on other platforms every file is checked periodically.'),
 
         ('\033[37;1m-T=[SECS]\033[0m, '
          '\033[37;1m-t=[SECS]\033[0m, '
          '\033[37;1m--time=[SECS]\033[0m',
             'Specify time interval (in seconds) to look for file changes. The '
             'default value is 10 seconds. This option is only meaningful when '
-            'passed with `--watch`.'),
+            'passed with `--watch`, and inotify is not available, as otherwise '
+            'the changes are processed as soon as the kernel reports them.'),
+
+        ('\033[37;1m-J=[NUM]\033[0m, '
+         '\033[37;1m-j=[NUM]\033[0m, '
+         '\033[37;1m--jobs=[NUM]\033[0m',
+            'Specify the number of threads (NUM) hashing the files at the '
+            'same time. The default value is 1, which means the files are '
+            'hashed one after the other. The order of the processed files is '
+            'the same regardless of this value.'),
+
+        ('\033[37;1m--processes\033[0m',
+            'By default, the files are hashed (and scanned for tags) on '
+            'threads, if `--jobs` is greater than 1. By defining this '
+            'argument, janitor will use processes instead, which is faster '
+            'when lots of files changed, as the scanning of the files is not '
+            'serialized by the interpreter. The files are still processed in '
+            'the same order, and the cache is only written by janitor itself.'),
+
+        ('\033[37;1m--daemon\033[0m',
+            'Watches the work path (like --watch does), and answers the '
+            'queries of the clients about the changed files and the collected '
+            'tags on a unix domain socket in the cache directory, so they do '
+            'not have to load the cache for each question. Use the client.py '
+            'script to ask it, or to stop it.'),
+
+        ('\033[37;1m--stats[=FILE]\033[0m',
+            'Prints the time spent in each phase (loading the configuration '
+            'and the cache, walking, hashing, running each module and saving '
+            'the cache), the number of visited, skipped, hashed and changed '
+            'files, the number of hashed bytes and the rate of the files found '
+            'unchanged without reading them. If FILE is specified, the same '
+            'is written into it as a line of JSON. In watch mode this is done '
+            'after each cycle, and the lines are appended to FILE.'),
+
+        ('\033[37;1m--verbosity=[LEVEL]\033[0m',
+            'Sets how detailed the output is. LEVEL can be: quiet (prints '
+            'only the errors and the requested outputs, like the results of '
+            'queries and statistics), summary (prints the messages and the '
+            'number of used and skipped files and the found tags of each '
+            'module after each cycle), files (prints the messages and every '
+            'used and skipped file) or tags (prints the tags found in the '
+            'files as well, this is the default). The output is buffered, '
+            'and if it is not a terminal, it is not colored.'),
 
         ('\033[37;1m-C=[FILE]\033[0m, '
          '\033[37;1m-c=[FILE]\033[0m, '
@@ -178,6 +246,17 @@ _HELP = OrderedDict((
             'manipulating any of the sequences. The valid values are: major, '
             'minor, maintenance and build.'),
 
+        ('\033[37;1m-Q=[TERM]\033[0m, '
+         '\033[37;1m-q=[TERM]\033[0m, '
+         '\033[37;1m--query=[TERM]\033[0m',
+            "Searches the tags stored in the tagger's database (which can be "
+            'enabled by the `database` option of the tagger), without '
+            'scanning any files. A TERM can be a word (or mark name) like '
+            '`fixme`, a folder relative to the work path like `path:src/net` '
+            'or a piece of text like `text:socket`. The argument can be passed '
+            'several times: terms of the same kind are alternatives, and '
+            'terms of different kinds are all required.'),
+
         ('\033[37;1m-P=[PATH]\033[0m, '
          '\033[37;1m-p=[PATH]\033[0m, '
          '\033[37;1m--path=[PATH]\033[0m',
@@ -199,6 +278,11 @@ _HELP = OrderedDict((
 
 
 
+# Buffers the output, and removes the colors if it is not a terminal
+_log = Logger()
+
+
+
 # Helper functions
 #------------------------------------------------------------------------------#
 def help_printer(data,
@@ -212,6 +296,8 @@ def help_printer(data,
     length_2 = width - len(spaces_2)
 
     # Process input data
+    # NOTE: The lines are written by the logger, which removes
+    #       the colors, if janitor is not running in a terminal
     for key, value in data.items():
         # If value is a dictionary
         try:
@@ -223,32 +309,102 @@ def help_printer(data,
                                   (spaces_2, wrap(value, width=length_2))):
                 # Print lines with indentation
                 for line in lines:
-                    print(indent, line, sep='')
+                    _log.write(Logger.QUIET, indent + line)
             # Separate blocks with a single new line
-            print()
+            _log.write(Logger.QUIET, '')
 
 #------------------------------------------------------------------------------#
-def jprint(*args, **kwargs):
-    print(_JPRINT, *args, **kwargs)
+def jprint(*args, level=Logger.SUMMARY):
+    _log.write(level, _JPRINT, *args)
 
 #------------------------------------------------------------------------------#
-def jerror(*args, **kwargs):
-    print(_JERROR, file=stderr, *args, **kwargs)
+def jerror(*args):
+    _log.error(_JERROR, *args)
 
 #------------------------------------------------------------------------------#
-def jskip(indent, owner, *args, **kwargs):
-    print(_SKIP.format(indent, owner + ':'), *args, **kwargs)
+def jskip(indent, owner, *args):
+    _log.count(owner, 'skips')
+    if _log.level >= Logger.FILES:
+        _log.write(Logger.FILES, _SKIP.format(indent, owner + ':'), *args)
 
 #------------------------------------------------------------------------------#
-def juse(indent, owner, *args, **kwargs):
-    print(_USE.format(indent, owner + ':'), *args, **kwargs)
+def juse(indent, owner, *args):
+    _log.count(owner, 'uses')
+    if _log.level >= Logger.FILES:
+        _log.write(Logger.FILES, _USE.format(indent, owner + ':'), *args)
 
+#------------------------------------------------------------------------------#
+def jtags(indent, tags):
+    _log.count('tagger', 'tags', len(tags))
+    if _log.level >= Logger.TAGS:
+        for tag in tags:
+            _log.write(Logger.TAGS,
+                       _TAG.format(indent, tag.line, tag.word), tag.text)
+
+#------------------------------------------------------------------------------#
+def jskip_all(path, folder):
+    jskip(_INDENT, '<ALL>', join(path, '*') if folder else path)
+
+#------------------------------------------------------------------------------#
+def jsummary():
+    # Print the aggregated counts of the owners since the last call
+    counts = _log.counts()
+    if (not counts or
+        _log.level != Logger.SUMMARY):
+            return
+    jprint('Summary:')
+    for owner, counter in counts.items():
+        _log.write(Logger.SUMMARY,
+                   '{}\033[37;1m{:<{}}\033[0m'.format(_INDENT, owner + ':',
+                                                     _MOD_NAME_LEN),
+                   ', '.join('{} {}'.format(action, count)
+                                 for action, count in sorted(counter.items())))
+
+#------------------------------------------------------------------------------#
+def query_tags(path, terms):
+    # Sort terms, bare terms are words, paths are relative to the work path
+    words   = []
+    folders = []
+    texts   = []
+    for term in sorted(terms):
+        kind, separator, value = term.partition(':')
+        if not separator:
+            kind, value = 'word', term
+        if kind == 'word':
+            words.append(value)
+        # The stored paths are normalized, so 'src', './src' and
+        # 'src/' (or the absolute path of src) are the same folder
+        elif kind == 'path':
+            folders.append(normpath(join(dirname(path), value)))
+        elif kind == 'text':
+            texts.append(value)
+        else:
+            jerror('Invalid query term {!r}, it should be one of: '
+                   'WORD, word:WORD, path:PATH, text:TEXT'.format(term))
+            exit(EX_USAGE)
+
+    # Search tags
+    try:
+        store = TagStore(path)
+    except TagStore.Unavailable as e:
+        jerror('Cannot use the tag database:', e)
+        exit(EX_CONFIG)
+    if store.empty:
+        jprint("No tags are stored, set the tagger's `database` option to "
+               'true, and run janitor to collect them')
+    else:
+        rows = store.query(words, folders, texts)
+        jprint('Found {} tags:'.format(len(rows)))
+        start = len(dirname(path)) + 1
+        for file, line, word, text in rows:
+            _log.write(Logger.QUIET,
+                       _QUERY.format(_INDENT, file[start:], line, word), text)
+    store.close()
 
 #------------------------------------------------------------------------------#
 class Janitor:
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
-    class Skip(Exception): pass
     class FinishedWithoutError(Exception): pass
 
 
@@ -290,6 +446,8 @@ class Janitor:
                         raise IndexError
                 elif argument in _BOOL_LONG:
                     options[argument] = True
+                elif argument in _OPT_LONG:
+                    options[argument] = value[0] if value and value[0] else True
             except IndexError:
                 jerror('No value passed to {!r}'.format(argument))
                 exit(EX_USAGE)
@@ -299,33 +457,63 @@ class Janitor:
 
 
     #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
-    def __init__(self, help     = False,
-                       version  = False,
-                       rebuild  = False,
-                       update   = False,
-                       generate = False,
-                       default  = False,
-                       md5      = False,
-                       sha      = False,
-                       kill     = False,
-                       watch    = False,
-                       time     = 10.0,
-                       path     = None,
-                       config   = None,
-                       exclude  = set(),
-                       increase = set()):
+    def __init__(self, help      = False,
+                       version   = False,
+                       rebuild   = False,
+                       update    = False,
+                       generate  = False,
+                       default   = False,
+                       md5       = False,
+                       sha       = False,
+                       paranoid  = False,
+                       git       = False,
+                       processes = False,
+                       kill      = False,
+                       watch     = False,
+                       time      = 10.0,
+                       jobs      = 1,
+                       path      = None,
+                       config    = None,
+                       exclude   = set(),
+                       increase  = set(),
+                       query     = set(),
+                       stats     = False,
+                       verbosity = None,
+                       daemon    = False):
+        timer  = Stats()
+        server = None
         try:
+            # Set the verbosity of the output
+            if verbosity is not None:
+                try:
+                    _log.set_level(verbosity)
+                except Logger.InvalidLevel:
+                    jerror('Invalid value for `verbosity`: {!r}, it should be '
+                           'one of: {}'.format(verbosity,
+                                               ', '.join(Logger.LEVELS)))
+                    exit(EX_USAGE)
+
             # Print version information
             if version:
-                return jprint('version: 1.0.0.000 (20150621)')
+                jprint('version: 1.0.0.000 (20150621)', level=Logger.QUIET)
+                return _log.flush()
 
             # Print help information
             if help:
                 # TODO: add version number to help text
-                _, width = (int(v) for v in
-                                check_output('stty size',
-                                             shell=True).decode('utf-8').split())
-                return help_printer(_HELP, width, _INDENT)
+                # If janitor is not running in a terminal (or the terminal
+                # does not know its size), use the default width
+                try:
+                    _, width = (int(v) for v in
+                                    check_output('stty size', shell=True,
+                                                 stderr=DEVNULL
+                                                 ).decode('utf-8').split())
+                    if width <= 0:
+                        raise ValueError
+                except (OSError, ValueError, CalledProcessError):
+                    width = 80
+                help_printer(_HELP, width, _INDENT)
+                return _log.flush()
 
             # Set working-path
             path = abspath(expanduser(expandvars(path or getcwd())))
@@ -343,6 +531,11 @@ class Janitor:
                 rmtree(cache_dir, ignore_errors=True)
                 raise Janitor.FinishedWithoutError
 
+            # Search the stored tags and return
+            if query:
+                query_tags(cache_dir, query)
+                raise Janitor.FinishedWithoutError
+
             # Create sample config file if specified
             if generate:
                 configer = Configer.from_default(config_dir_path=path)
@@ -350,24 +543,44 @@ class Janitor:
                        '\n{}{}'.format(_INDENT, configer.to_file()))
                 raise Janitor.FinishedWithoutError
 
-            # Set configuration
+            # Load the configuration and the caches
             try:
-                if default:
-                    configer = Configer.from_default()
-                    jprint('Uses default configuration')
-                elif config:
-                    config = expanduser(expandvars(config))
-                    configer = Configer(config_file_path=config)
-                    jprint('Uses manually specified configuration file:'
-                           '\n{}{}'.format(_INDENT, config))
-                else:
-                    configer = Configer(config_dir_path=path)
-                    jprint('Uses configuration file:'
-                           '\n{}{}'.format(_INDENT, join(path, Configer.FILE_NAME)))
+                session = Session(path,
+                                  config,
+                                  default,
+                                  md5,
+                                  sha,
+                                  paranoid,
+                                  git,
+                                  jobs,
+                                  processes,
+                                  rebuild,
+                                  exclude,
+                                  timer)
             except Configer.InvalidConfigFileFormat as e:
                 jerror('Invalid JSON format in the configuration file')
                 jerror(e)
                 exit(EX_CONFIG)
+            except (Session.Unavailable,
+                    Session.InvalidValue) as e:
+                jerror(e)
+                exit(EX_CONFIG)
+            except TagStore.Unavailable as e:
+                jerror('Cannot use the tag database:', e)
+                exit(EX_CONFIG)
+            except Prefixer.InvalidAlignment as e:
+                jerror('Invalid value for the `align` option of the '
+                       'prefixer: {!r}'.format(str(e)))
+                exit(EX_CONFIG)
+
+            if default:
+                jprint('Uses default configuration')
+            elif config:
+                jprint('Uses manually specified configuration file:'
+                       '\n{}{}'.format(_INDENT, expanduser(expandvars(config))))
+            else:
+                jprint('Uses configuration file:'
+                       '\n{}{}'.format(_INDENT, join(path, Configer.FILE_NAME)))
 
             ## If use the `versioner` module
             #if configer['versioner']['use']:
@@ -385,43 +598,22 @@ class Janitor:
             #    versioner.to_file()
             #    return jprint('Current version is: {}'.format(versioner.version))
 
-            # Import hashing algorithm
-            if md5:
-                hash_id = 0
-                from hashlib  import md5    as hasher
-                jprint('Uses MD5 hashing algorithm')
-            elif sha:
-                hash_id = 1
-                from hashlib  import sha1   as hasher
-                jprint('Uses SHA1 hashing algorithm')
-            else:
-                hash_id = 2
-                try:
-                    from pyhashxx import Hashxx as hasher
-                    jprint('Uses xxHash hashing algorithm')
-                except ImportError:
-                    jerror('cannot use default hashing: '
-                           'pyhashxx is not installed')
-                    exit(EX_CONFIG)
-
-            # Create checker
-            checker = Checker(cache_dir, hash_id, hasher)
-
-            # Rebuild or update
+            jprint('Uses {} hashing algorithm'.format(session.hasher))
+            if session.jobs > 1:
+                jprint('Hashes files on {} {}'.format(
+                    session.jobs, 'processes' if processes else 'threads'))
+            if session.git_index is not None:
+                jprint('Uses the git index for the tracked files')
+            elif session.git_error is not None:
+                jprint('Cannot use the git index ({}), hashes '
+                       'every changed file'.format(session.git_error))
+            if paranoid:
+                jprint('Hashes every file regardless of their stat data')
             if rebuild:
                 jprint('Rebuilds cache files')
-                checker.rebuild()
-
-            # Collect all-excludes
-            all_exclude = configer['exclude']
-            for module in _MOD_USE_FILE:
-                if configer[module]['use']:
-                    mod_exclude = configer[module]['exclude']
-                    for type in all_exclude:
-                        try:
-                            all_exclude[type] &= mod_exclude[type]
-                        except KeyError:
-                            pass
+
+            # The daemon is the waiting step of the watch loop
+            watch = watch or daemon
 
             # If watching look for time
             if watch:
@@ -433,86 +625,63 @@ class Janitor:
                            '{!r} is not a floating point number'.format(time))
                     exit(EX_CONFIG)
 
+            # If watching, try to use the kernel's notifications
+            watcher = None
+            if watch:
+                try:
+                    watcher = Watcher()
+                    jprint('Uses inotify to watch for changes')
+                except Watcher.Unavailable:
+                    jprint('Polls for changes in every {} seconds'.format(time))
+
+            # If answering queries while watching
+            if daemon:
+                try:
+                    server = Daemon(session)
+                except Daemon.Unavailable as e:
+                    jerror('Cannot start the daemon:', e)
+                    exit(EX_CONFIG)
+                jprint('Serves queries on:\n{}{}'.format(
+                    _INDENT, Daemon.socket_of(session.cache_dir)))
+
             # Go through each module and pass the necessary infos to them
+            modules     = session.modules
             first_cycle = True
+            files       = session.walk(jskip_all, watcher)
+            whole       = True
             while True:
                 if first_cycle:
                     jprint('Walks through all files and folders in work path:')
-                changed_files = []
-                for root, dirs, files in walk(path):
-                    # If skip this folder and all subfolders for every module
-                    if root in all_exclude['folders']:
-                        if first_cycle:
-                            jskip(_INDENT, '<ALL>', join(root, '*'), sep='')
-                        dirs.clear()
-                        continue
-
-                    # If skip subfolder
-                    for dir in dirs:
-                        if dir in all_exclude['folders']:
-                            if first_cycle:
-                                jskip(_INDENT, '<ALL>', join(root, dir, '*'))
-                            dirs.remove(dir)
-
-                    # Go through all files
-                    for file in files:
-                        _, ext = splitext(file)
-                        # If extension or the filepath is on the black-list
-                        if (ext in all_exclude['extensions']     or
-                            ext[1:] in all_exclude['extensions'] or
-                            file in all_exclude['names']):
-                                if first_cycle:
-                                    jskip(_INDENT, '<ALL>', join(root, file))
-                                continue
-
-                        # If file changed
-                        file = join(root, file)
-                        if checker.is_changed(file):
-                            changed_files.append(file)
-                            # If this is an update cycle only
-                            if update:
-                                continue
-                            # Go through each module
-                            for module in _MOD_USE_FILE:
-                                mod_exclude = configer[module]['exclude']
-                                # If file should be processed
-                                try:
-                                    # If this folder is excluded for module
-                                    exclude = mod_exclude.get('folders', ())
-                                    if (root in exclude or
-                                        basename(root) in exclude):
-                                            raise Janitor.Skip
-
-                                    # If this extension is excluded for module
-                                    exclude = mod_exclude.get('extensions', ())
-                                    if (ext in exclude or
-                                        ext[1:] in exclude):
-                                            raise Janitor.Skip
-
-                                    # If this file is excluded for module
-                                    exclude = mod_exclude.get('names', ())
-                                    if (file in exclude):
-                                        raise Janitor.Skip
-
-                                    # Use this file
-                                    juse(_INDENT, module, file)
-                                # If file should be skipped
-                                except Janitor.Skip:
-                                    jskip(_INDENT, module, file)
-                                    continue
-
-                # If any file changed since last
-                # check, update and save cache
-                if changed_files:
-                    #for module in _MODULES:
-                    #    module.done()
-                    #    module.to_file()
-                    if update:
-                        jprint('Updates cache files')
-                    checker.update(changed_files)
-                    checker.to_file()
-                    if (watch and
-                        not first_cycle):
+                result = session.run(files, whole, update)
+                if server is not None:
+                    server.record(result)
+                # If this is not an update cycle only
+                if not update:
+                    for file in result.files:
+                        # Go through each module
+                        for module in modules:
+                            # If file should be processed
+                            if module in file.modules:
+                                juse(_INDENT, module, file.path)
+                                if module == 'tagger':
+                                    jtags(_INDENT*2, file.tags)
+                            # If file should be skipped
+                            else:
+                                jskip(_INDENT, module, file.path)
+                elif result.files:
+                    jprint('Updates cache files')
+
+                # Report the counts and the statistics of this cycle
+                jsummary()
+                if stats:
+                    jprint('Statistics:', level=Logger.QUIET)
+                    for line in timer.report(_INDENT):
+                        _log.write(Logger.QUIET, line)
+                    if stats is not True:
+                        timer.to_file(stats)
+                if (result.files and
+                    watch and
+                    not first_cycle):
                         jprint('Watching for changes...')
 
                 # If constantly watching
@@ -521,17 +690,46 @@ class Janitor:
                         jprint('Watching for changes...')
                     first_cycle = False
                     update      = False
-                    sleep(time)
+                    # If some folders could not be watched, fall back to polling
+                    if (watcher is not None and
+                        watcher.error):
+                            jprint('Cannot use inotify ({}), polls for changes '
+                                   'in every {} seconds'.format(watcher.error, time))
+                            watcher.close()
+                            watcher = None
+                    # Wait for changes
+                    _log.flush()
+                    if server is not None:
+                        waited = server.wait(watcher, time)
+                        # If the daemon was asked to stop
+                        if waited is None:
+                            break
+                        files, whole = waited
+                    elif watcher is not None:
+                        files, whole, removed = session.changes(watcher)
+                        session.forget(removed)
+                    else:
+                        sleep(time)
+                        files = session.walk()
+                        whole = True
                 else:
                     break
+            session.close()
+            if watcher is not None:
+                watcher.close()
         # If no error occured
         except KeyboardInterrupt:
-            print()
+            _log.write(Logger.QUIET)
         except Janitor.FinishedWithoutError:
             pass
+        finally:
+            if server is not None:
+                server.close()
+            _log.flush()
 
         # Report to user
-        return jprint('Finished')
+        jprint('Finished')
+        _log.flush()
 
 
 #------------------------------------------------------------------------------#
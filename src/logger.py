@@ -0,0 +1,108 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from re          import compile
+from sys         import (stdout,
+                         stderr)
+from collections import (Counter,
+                         OrderedDict)
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+_ESCAPE = compile(r'\033\[[0-9;]*m')
+
+
+
+#------------------------------------------------------------------------------#
+class Logger:
+
+    # NOTE: The lines are collected and written in large chunks, instead of
+    #       writing (and flushing, when stdout is a terminal) them one by one,
+    #       so the buffer has to be flushed before waiting for anything, and
+    #       before writing to stderr, to keep the order of the messages
+
+    # Class level constants
+    QUIET       = 0   # only errors and the explicitly requested output
+    SUMMARY     = 1   # messages and the aggregated counts of each cycle
+    FILES       = 2   # messages and every used and skipped file
+    TAGS        = 3   # messages, files and the tags found in them
+    LEVELS      = OrderedDict((('quiet'  , QUIET),
+                               ('summary', SUMMARY),
+                               ('files'  , FILES),
+                               ('tags'   , TAGS)))
+    BUFFER_SIZE = 2**16
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class InvalidLevel(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, level=TAGS, output=stdout, errors=stderr):
+        self.level   = level
+        self._output = output
+        self._errors = errors
+        # Colors are only used on terminals
+        self._colors = output.isatty()
+        self._buffer = []
+        self._size   = 0
+        self._counts = OrderedDict()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def set_level(self, name):
+        try:
+            self.level = Logger.LEVELS[name]
+        except KeyError:
+            raise Logger.InvalidLevel(name) from None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def write(self, level, *args):
+        # Buffer the arguments as a line (like print does), if it is
+        # not more detailed than the current level of verbosity
+        if level > self.level:
+            return
+        line = ' '.join(map(str, args)) + '\n'
+        if not self._colors:
+            line = _ESCAPE.sub('', line)
+        self._buffer.append(line)
+        self._size += len(line)
+        if self._size >= Logger.BUFFER_SIZE:
+            self.flush()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def error(self, *args):
+        self.flush()
+        line = ' '.join(map(str, args)) + '\n'
+        if not self._errors.isatty():
+            line = _ESCAPE.sub('', line)
+        self._errors.write(line)
+        self._errors.flush()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def flush(self):
+        if self._buffer:
+            self._output.write(''.join(self._buffer))
+            self._buffer = []
+            self._size   = 0
+        self._output.flush()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def count(self, owner, action, value=1):
+        # Count the actions of owner, regardless of the level of verbosity
+        try:
+            self._counts[owner][action] += value
+        except KeyError:
+            self._counts[owner] = Counter({action: value})
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def counts(self):
+        # Return the counters of the owners since the last call
+        counts, self._counts = self._counts, OrderedDict()
+        return counts
@@ -0,0 +1,331 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from re      import (escape,
+                     compile)
+from os.path import (join,
+                     split,
+                     dirname)
+
+# Import janitor modules
+from gitindex import find_repository
+
+
+#------------------------------------------------------------------------------#
+def translate(pattern):
+    # Translate a glob pattern to a regular expression, where `*` and `?`
+    # do not match the path separator, but `**` matches any number of folders
+    result = []
+    index  = 0
+    length = len(pattern)
+    while index < length:
+        char   = pattern[index]
+        index += 1
+        if char == '*':
+            if pattern.startswith('*', index):
+                index += 1
+                if pattern.startswith('/', index):
+                    index += 1
+                    result.append('(?:.*/)?')
+                else:
+                    result.append('.*')
+            else:
+                result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        # If the next character is escaped
+        elif (char == '\\' and
+              index < length):
+            result.append(escape(pattern[index]))
+            index += 1
+        elif char == '[':
+            end = index
+            if pattern.startswith('!', end):
+                end += 1
+            if pattern.startswith(']', end):
+                end += 1
+            end = pattern.find(']', end)
+            # If bracket is not closed, it is a literal
+            if end < 0:
+                result.append(escape(char))
+                continue
+            group = pattern[index:end].replace('\\', '\\\\')
+            index = end + 1
+            if group.startswith('!'):
+                group = '^' + group[1:]
+            result.append('[{}]'.format(group))
+        else:
+            result.append(escape(char))
+    return ''.join(result)
+
+#------------------------------------------------------------------------------#
+def compile_globs(patterns):
+    # Compile patterns into a single regular expression, or return None,
+    # so an empty pattern list costs nothing when it is matched against
+    patterns = tuple(patterns)
+    if patterns:
+        return compile('(?:{})\\Z'.format('|'.join(map(translate, patterns)))).match
+
+
+
+#------------------------------------------------------------------------------#
+class _Ignore:
+
+    # NOTE: The patterns of an ignore file are compiled into a single regular
+    #       expression, where each pattern is a group, in reverse order, so
+    #       the first matching group is the last matching pattern of the file,
+    #       which decides whether the path is ignored or not (negated)
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, lines):
+        patterns = []
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if (not line or
+                line.startswith('#')):
+                    continue
+            # Trailing spaces are ignored, unless they are escaped
+            stripped = line.rstrip(' ')
+            if (stripped.endswith('\\') and
+                len(stripped) < len(line)):
+                    stripped += ' '
+            line   = stripped
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            # Patterns ending with a separator only match folders
+            folder = line.endswith('/')
+            line   = line.rstrip('/')
+            if not line:
+                continue
+            # Patterns with a separator are relative to the ignore file's
+            # folder, the others are matched against names at any level
+            if '/' in line:
+                expression = translate(line.lstrip('/'))
+            else:
+                expression = '(?:.*/)?' + translate(line)
+            patterns.append((expression, negate, folder))
+        patterns.reverse()
+
+        def compile_patterns(patterns):
+            if patterns:
+                return (compile('(?:{})\\Z'.format(
+                            '|'.join('({})'.format(expression)
+                                         for expression, _, _ in patterns))).match,
+                        tuple(negate for _, negate, _ in patterns))
+            return None, ()
+        self._files   = compile_patterns([p for p in patterns if not p[2]])
+        self._folders = compile_patterns(patterns)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __bool__(self):
+        return self._folders[0] is not None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def ignored(self, relative, folder):
+        # Return True if path is ignored, False if it is explicitly
+        # not ignored (negated), and None if no pattern matches it
+        match, negated = self._folders if folder else self._files
+        if match is not None:
+            result = match(relative)
+            if result is not None:
+                return not negated[result.lastindex - 1]
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @classmethod
+    def from_file(cls, path):
+        # Return the rules of the ignore file, or None if there is no such file
+        try:
+            with open(path, errors='surrogateescape') as file:
+                rules = cls(file)
+        except (OSError, UnicodeError):
+            return
+        return rules or None
+
+
+
+#------------------------------------------------------------------------------#
+class _Rules:
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path, exclude):
+        # Patterns with a separator (or absolute paths inside the work path)
+        # are anchored to the work path, the others are matched against names
+        def split_patterns(patterns):
+            names = []
+            paths = []
+            for pattern in patterns:
+                if pattern.startswith(path + '/'):
+                    paths.append(pattern[len(path) + 1:].rstrip('/'))
+                elif '/' in pattern.rstrip('/'):
+                    paths.append(pattern.strip('/'))
+                else:
+                    names.append(pattern.rstrip('/'))
+            return compile_globs(names), compile_globs(paths)
+
+        self.folder_names, self.folder_paths = \
+            split_patterns(exclude.get('folders', ()))
+        self.file_names, self.file_paths = \
+            split_patterns(exclude.get('names', ()))
+        self.extensions = \
+            compile_globs(e[1:] if e.startswith('.') else e
+                              for e in exclude.get('extensions', ()))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def folder(self, name, relative):
+        return ((self.folder_names is not None and
+                 self.folder_names(name) is not None) or
+                (self.folder_paths is not None and
+                 self.folder_paths(relative) is not None))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def file(self, name, ext, relative):
+        return ((self.extensions is not None and
+                 self.extensions(ext) is not None) or
+                (self.file_names is not None and
+                 self.file_names(name) is not None) or
+                (self.file_paths is not None and
+                 self.file_paths(relative) is not None))
+
+
+
+#------------------------------------------------------------------------------#
+class Matcher:
+
+    # Class level constants
+    IGNORE_FILE = '.gitignore'
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path, exclude, modules):
+        # NOTE: `exclude` is the global exclude section of the configuration,
+        #       `modules` is an ordered mapping of the used modules and their
+        #       exclude sections, everything is compiled only once here
+        self._path    = path.rstrip('/')
+        self._prefix  = len(self._path) + 1
+        self._global  = _Rules(self._path, exclude)
+        self._modules = tuple((module, _Rules(self._path, mod_exclude))
+                                  for module, mod_exclude in modules.items())
+        # Modules using the files of the already visited folders
+        self._folders = {self._path: self._modules}
+        # Ignore files of the already visited folders
+        self._ignores = None
+        if exclude.get('gitignore'):
+            self._ignores = {self._path: self._root_ignores()}
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _root_ignores(self):
+        # Return the rules of the ignore files of the work path, and of its
+        # parents inside the repository, and the repository's own exclude
+        # file (deepest first), as they are all applied to the walked files
+        ignores = []
+        def add(folder, file):
+            ignore = _Ignore.from_file(file)
+            if ignore is not None:
+                ignores.append((folder, ignore))
+
+        add(self._path, join(self._path, Matcher.IGNORE_FILE))
+        root, git_dir = find_repository(self._path)
+        if root is not None:
+            folder = self._path
+            while folder != root:
+                folder = dirname(folder)
+                add(folder, join(folder, Matcher.IGNORE_FILE))
+            add(root, join(git_dir, 'info', 'exclude'))
+        return tuple(ignores)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _ignores_of(self, folder):
+        # Return the rules applied to the entries of folder: the rules of its
+        # own ignore file (if there is any), then the ones of its parents
+        try:
+            return self._ignores[folder]
+        except KeyError:
+            pass
+        parent = dirname(folder)
+        # If folder is the root of the file system, or outside the work path
+        if parent == folder:
+            return ()
+        ignores = self._ignores_of(parent)
+        ignore  = _Ignore.from_file(join(folder, Matcher.IGNORE_FILE))
+        if ignore is not None:
+            ignores = ((folder, ignore),) + ignores
+        self._ignores[folder] = ignores
+        return ignores
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _ignored(self, path, folder):
+        # Deeper ignore files override the ones of their parents
+        for base, ignore in self._ignores_of(dirname(path)):
+            ignored = ignore.ignored(path[len(base) + 1:], folder)
+            if ignored is not None:
+                return ignored
+        return False
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _relative(self, path):
+        return path[self._prefix:]
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _folder(self, folder):
+        # Return the modules using the files inside folder, which are the
+        # modules using its parent, except the ones excluding this folder
+        try:
+            return self._folders[folder]
+        except KeyError:
+            pass
+        parent, name = split(folder)
+        # If folder is the root of the file system, or outside the work path
+        if parent == folder:
+            return self._modules
+        relative = self._relative(folder)
+        modules  = self._folders[folder] = \
+            tuple((module, rules) for module, rules in self._folder(parent)
+                                      if not rules.folder(name, relative))
+        return modules
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def prune(self, folder):
+        # If folder and everything inside it is excluded for every module
+        # NOTE: The patterns are about the folders inside the work path,
+        #       so the name of the work path itself is never matched
+        if folder == self._path:
+            return False
+        parent, name = split(folder)
+        if self._global.folder(name, self._relative(folder)):
+            return True
+        # If folder is ignored by git, it is never entered
+        if (self._ignores is not None and
+            self._ignored(folder, True)):
+                return True
+        return (bool(self._modules) and
+                not self._folder(folder))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def modules(self, root, name, ext):
+        # Return the modules using the file, or None if the file is
+        # excluded globally or for every module, and should be skipped
+        relative = self._relative(join(root, name))
+        if self._global.file(name, ext, relative):
+            return
+        if (self._ignores is not None and
+            self._ignored(join(root, name), False)):
+                return
+        modules = tuple(module for module, rules in self._folder(root)
+                                   if not rules.file(name, ext, relative))
+        # If no module is used at all, the file
+        # is still tracked unless globally excluded
+        if (modules or
+            not self._modules):
+                return modules
@@ -1,6 +1,125 @@
 ## INFO ##
 ## INFO ##
 
+# Import python modules
+from os          import (fstat,
+                         fchmod,
+                         unlink,
+                         replace)
+from re          import compile
+from os.path     import (split,
+                         splitext,
+                         realpath)
+from stat        import S_IMODE
+from shutil      import copyfileobj
+from tempfile    import mkstemp
+from itertools   import groupby
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+_HASH    = '#', '#'
+_SLASH   = '//', '//'
+_STAR    = '/*', '*/'
+_DASH    = '--', '--'
+_PERCENT = '%', '%'
+_SEMI    = ';;', ';;'
+_MARKUP  = '<!--', '-->'
+# A byte order mark has to be the first, a shebang line, an xml declaration
+# and a php opening tag the first line, and a (PEP 263) coding declaration
+# the first or the second line, so the header is written after them
+_BOM     = b'\xef\xbb\xbf'
+_FIRST   = b'#!', b'<?xml', b'<?php'
+_CODING  = compile(rb'[ \t\f]*#.*?coding[:=][ \t]*[-\w.]+')
+
+
+
+#------------------------------------------------------------------------------#
+def start_of(head):
+    # Return the position where the header should start: after the
+    # lines which have to stay at the top of the file, if there are any
+    after = lambda start: head.find(b'\n', start) + 1 or len(head)
+    start = len(_BOM) if head.startswith(_BOM) else 0
+    first = after(start) if head.startswith(_FIRST, start) else start
+    if _CODING.match(head, first):
+        return after(first)
+    # A coding declaration can be the second line after any other line
+    if (first == start and
+        _CODING.match(head, after(start))):
+            return after(after(start))
+    return first
+
+
+
+#------------------------------------------------------------------------------#
+class Head:
+
+    # NOTE: A consumer, which keeps the beginning of the file fed to it, so
+    #       it can be decided whether its header is up to date or not
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, size):
+        self._size   = size
+        self._blocks = []
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def update(self, block):
+        if self._size > 0:
+            block = bytes(block[:self._size])
+            self._blocks.append(block)
+            self._size -= len(block)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def finish(self):
+        return b''.join(self._blocks)
+
+
+
+#------------------------------------------------------------------------------#
+class Template:
+
+    # NOTE: A template is the header of a comment style with everything
+    #       rendered in advance, except the lines containing the file name,
+    #       which are stored as the pieces of the text around the name
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, comment, tag, align, width, block):
+        begin, end = comment
+        tag   = '{}# {} #{}\n'.format(begin, tag, end)
+        width = max(width - len(begin) - len(end) - 2, 0)
+        line  = '{} {{:{}{}}} {}\n'.format(begin, align, width, end)
+        parts = [tag]
+        for text in block.splitlines():
+            pieces = text.split('{FILE}')
+            parts.append(line.format(text) if len(pieces) == 1 else pieces)
+        parts.append(tag)
+
+        # Merge the neighbouring rendered lines
+        self._parts = []
+        for rendered, group in groupby(parts, key=lambda part:
+                                                    isinstance(part, str)):
+            if rendered:
+                self._parts.append(''.join(group).encode('utf-8'))
+            else:
+                self._parts.extend(group)
+        self._line = line
+        self.tag   = tag.encode('utf-8')
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def render(self, name):
+        # NOTE: A name which is not valid UTF-8 is decoded with escaped
+        #       surrogates, so it is written back as the original bytes
+        line = self._line
+        return b''.join(part if isinstance(part, bytes) else
+                        line.format(name.join(part)).encode('utf-8',
+                                                            'surrogateescape')
+                            for part in self._parts)
+
+
+
 #------------------------------------------------------------------------------#
 class Prefixer:
 
@@ -11,3 +130,159 @@ class Prefixer:
     ALIGN_CENTER  = 'center'
     ALIGN_RIGHT   = 'right'
     BLOCK         = 'File: {FILE}\n'
+    HEAD_SIZE     = 2**12
+    MAX_HEAD      = 2**16
+    BLOCK_SIZE    = 2**16
+    TEMP_EXT      = '.temp'
+    # The beginning and the end of a comment line by file extension
+    COMMENTS      = dict(
+        [(ext, _HASH)    for ext in ('py', 'sh', 'bash', 'zsh', 'rb', 'pl',
+                                     'r', 'yml', 'yaml', 'toml', 'cmake')] +
+        [(ext, _SLASH)   for ext in ('cpp', 'cc', 'cxx', 'hpp', 'hh', 'hxx',
+                                     'java', 'js', 'ts', 'go', 'rs', 'swift',
+                                     'cs', 'm', 'scala', 'kt', 'php')] +
+        [(ext, _STAR)    for ext in ('c', 'h', 'css')] +
+        [(ext, _DASH)    for ext in ('lua', 'sql', 'hs', 'elm', 'ada')] +
+        [(ext, _PERCENT) for ext in ('tex', 'sty', 'erl')] +
+        [(ext, _SEMI)    for ext in ('lisp', 'el', 'clj', 'scm')] +
+        [(ext, _MARKUP)  for ext in ('html', 'htm', 'xml', 'svg')])
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class InvalidAlignment(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, tag=TAG,
+                       align=ALIGN_LEFT,
+                       width=WIDTH,
+                       block=BLOCK,
+                       **options):
+        try:
+            self._align = {Prefixer.ALIGN_LEFT  : '<',
+                           Prefixer.ALIGN_CENTER: '^',
+                           Prefixer.ALIGN_RIGHT : '>'}[align]
+        except KeyError:
+            raise Prefixer.InvalidAlignment(align) from None
+        self._tag       = tag.upper()
+        self._width     = width
+        self._block     = block
+        self._templates = {}
+        # The last rendered header, as `head` and `prefix`
+        # are called with the same file one after the other
+        self._last      = None, None, None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def template(self, comment):
+        # Return the template of the comment style, and create it if needed
+        try:
+            return self._templates[comment]
+        except KeyError:
+            template = self._templates[comment] = \
+                Template(comment, self._tag, self._align, self._width, self._block)
+            return template
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _header(self, name):
+        # Return the template and the header of the file, or
+        # None for both of them, if the type of the file is unknown
+        last_name, template, header = self._last
+        if name == last_name:
+            return template, header
+        try:
+            template = self.template(
+                Prefixer.COMMENTS[splitext(name)[1][1:].lower()])
+        except KeyError:
+            return None, None
+        header     = template.render(name)
+        self._last = name, template, header
+        return template, header
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def head(self, file):
+        # Return a consumer collecting as much of the beginning of the file
+        # as `prefix` needs, or None if the type of the file is unknown
+        _, header = self._header(split(file)[1])
+        if header is not None:
+            return Head(Prefixer.HEAD_SIZE + len(header))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def prefix(self, file, head=None):
+        # Return None if the type or the header of the file is unknown,
+        # False if its header is up to date, and True if it was rewritten
+        # NOTE: If file is a symbolic link, the file it points to is
+        #       rewritten, instead of replacing the link with a copy
+        file             = realpath(file)
+        folder, name     = split(file)
+        template, header = self._header(name)
+        if header is None:
+            return None
+        current = lambda head, start: head.startswith(header, start)
+
+        # If the beginning of the file has been read already
+        # (by a `Head` consumer), there is no need to open it
+        if (head is not None and
+            current(head, start_of(head))):
+                return False
+
+        tag = template.tag
+        with open(file, mode='rb') as source:
+            # Only the beginning of the file is needed to decide
+            # whether the header is up to date or not
+            head  = source.read(Prefixer.HEAD_SIZE + len(header))
+            start = start_of(head)
+            if current(head, start):
+                return False
+
+            # If there is a header already, find its end (the closing
+            # tag line), otherwise put the header before everything
+            body = start
+            if head.startswith(tag, start):
+                closing = b'\n' + tag.rstrip(b'\n')
+                first   = start + len(tag) - 1
+                stop    = head.find(closing, first)
+                while (stop < 0 and
+                       len(head) < Prefixer.MAX_HEAD):
+                    block = source.read(Prefixer.HEAD_SIZE)
+                    if not block:
+                        break
+                    head += block
+                    stop  = head.find(closing, first)
+                # If the header is not closed, or it is too long,
+                # do not guess where it ends, leave the file as it is
+                if stop < 0:
+                    return None
+                body = stop + len(closing)
+                if head.startswith(b'\n', body):
+                    body += 1
+
+            # Write the new header and copy the rest of the file after it
+            # into a temporary file, which will replace the original one
+            handle, temp = mkstemp(prefix='.' + name + '.',
+                                   suffix=Prefixer.TEMP_EXT,
+                                   dir=folder or '.')
+            try:
+                with open(handle, mode='wb') as target:
+                    fchmod(handle, S_IMODE(fstat(source.fileno()).st_mode))
+                    # Keep the lines before the header (a byte order mark
+                    # alone is not a line), and end the last one of them
+                    kept = head[:start]
+                    if (kept not in (b'', _BOM) and
+                        not kept.endswith(b'\n')):
+                            kept += b'\n'
+                    target.write(kept)
+                    target.write(header)
+                    # Separate a new header from the content
+                    if (body == start and
+                        head[body:body + 1] not in (b'', b'\n')):
+                            target.write(b'\n')
+                    target.write(head[body:])
+                    copyfileobj(source, target, Prefixer.BLOCK_SIZE)
+                replace(temp, file)
+            except BaseException:
+                unlink(temp)
+                raise
+        return True
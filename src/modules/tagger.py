@@ -2,10 +2,106 @@
 ## INFO ##
 
 # Import python modules
-from collections import OrderedDict
+from os          import (unlink,
+                         replace)
+from os.path     import (join,
+                         exists)
+from random      import randrange
+from pickle      import (dump,
+                         load,
+                         UnpicklingError,
+                         HIGHEST_PROTOCOL)
+from re          import (escape,
+                         compile,
+                         IGNORECASE)
+from collections import (namedtuple,
+                         OrderedDict)
 
 # Import janitor module
 from orderedset  import OrderedSet
+from tagstore    import TagStore
+
+
+#------------------------------------------------------------------------------#
+# A found tag: the number of its line, the word (or the name of the mark)
+# and the text following it in the same line
+Tag = namedtuple('Tag', ('line', 'word', 'text'))
+
+
+
+#------------------------------------------------------------------------------#
+class Scanner:
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, search, names, longest):
+        self._search  = search
+        self._names   = names
+        self._overlap = longest + 1
+        self._carry   = b''
+        self._start   = 0
+        self._line    = 1
+        self._tags    = []
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def update(self, block):
+        data = self._carry + block
+        # Only scan complete lines, and keep the last, unfinished one
+        end = data.rfind(b'\n') + 1
+        if end:
+            self._scan(data, end)
+            self._carry = data[end:]
+            self._start = 0
+        # If a line is too long to be kept in the memory, scan it, except its
+        # end, which could be the beginning of a tag crossing the block border
+        # (the byte before that is kept as well, to check the word boundary),
+        # and if the last tag found runs past the end, continue after it, so
+        # overlapping marks (like '????') are not found twice
+        elif len(data) > Tagger.MAX_LINE:
+            end  = len(data) - self._overlap
+            last = self._scan(data, end)
+            self._carry = data[end - 1:]
+            self._start = max(end, last) - (end - 1)
+        else:
+            self._carry = data
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _scan(self, data, end):
+        # NOTE: Matches are looked for in the whole data, so the word
+        #       boundaries are checked against the surrounding bytes,
+        #       but only the ones starting before `end` are recorded,
+        #       and the end of the last recorded one is returned
+        tags  = self._tags
+        names = self._names
+        count = data.count
+        find  = data.find
+        line  = self._line
+        start = prev = last = self._start
+        for match in self._search(data, start):
+            if match.start() >= end:
+                break
+            line += count(b'\n', prev, match.start())
+            prev  = match.start()
+            stop  = find(b'\n', match.end())
+            if stop < 0:
+                stop = len(data)
+            text = data[match.end():min(stop, match.end() + Tagger.MAX_TEXT)]
+            text = text.decode('utf-8', 'replace').strip().lstrip(':').strip()
+            word = match.group().lower()
+            tags.append(Tag(line, names.get(word, word.decode('utf-8')), text))
+            last  = match.end()
+        self._line = line + count(b'\n', prev, end)
+        return last
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def finish(self):
+        # Scan the last line, which has no new line at its end
+        if self._carry:
+            self._scan(self._carry, len(self._carry))
+            self._carry = b''
+        return self._tags
 
 
 
@@ -13,5 +109,245 @@ from orderedset  import OrderedSet
 class Tagger:
 
     # Class level constants
-    WORDS = OrderedSet(('fixme', 'todo', 'bug', 'hack', 'note', 'xxx'))
-    MARKS = OrderedDict([('!!!', 'alert'), ('???', 'question')])
+    WORDS       = OrderedSet(('fixme', 'todo', 'bug', 'hack', 'note', 'xxx'))
+    MARKS       = OrderedDict([('!!!', 'alert'), ('???', 'question')])
+    FILE_NAME   = 'tags'
+    REPORT_NAME = 'TAGS'
+    STALE_NAME  = 'tags.stale'
+    TEMP_EXT    = '.temp'
+    BLOCK_SIZE  = 2**16
+    MAX_LINE    = 2**16
+    MAX_TEXT    = 2**8
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def fresh(self):
+        # True if there was no usable index, so every file has to be scanned
+        return self._fresh
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def stale(self):
+        # True if the check_sums were updated without the tagger since the
+        # index was saved, so the index may not know about every change
+        return self._stale
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def outdate(path):
+        # Mark the index saved in path (if there is any) as stale
+        if exists(join(path, Tagger.FILE_NAME)):
+            open(join(path, Tagger.STALE_NAME), mode='w').close()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path=None,
+                       words=WORDS,
+                       marks=MARKS,
+                       exclude=None,
+                       database=False,
+                       **options):
+        # Build a single expression matching every word and every mark, so
+        # each file is scanned only once, regardless of the number of tags
+        self._settings = repr((list(words), list(marks.items()), exclude))
+        words  = [word.lower().encode('utf-8') for word in words]
+        marks  = OrderedDict((mark.lower().encode('utf-8'), name)
+                                 for mark, name in marks.items())
+        # Longer alternatives first, so 'todos' is not matched as 'todo'
+        by_len = lambda item: -len(item)
+        parts  = []
+        if words:
+            parts.append(b'\\b(?:' +
+                         b'|'.join(map(escape, sorted(words, key=by_len))) +
+                         b')\\b')
+        if marks:
+            parts.append(b'|'.join(map(escape, sorted(marks, key=by_len))))
+        # NOTE: The search is sent to the worker processes with the scanners,
+        #       so it has to be picklable, even if it never matches anything
+        self._search  = compile(b'|'.join(parts) if parts else b'(?!)',
+                                IGNORECASE).finditer
+        self._names   = marks
+        self._longest = max(map(len, words + list(marks)), default=0)
+
+        # The index stores the check_sum, the tags and the rendered report of
+        # each file, so only files with a different check_sum are scanned
+        self._path    = path
+        self._index   = {}
+        self._dirty   = False
+        self._fresh   = True
+        self._stale   = False
+        self._gen     = 0
+        self._store   = None
+        self._updated = {}
+        self._removed = set()
+        if path is None:
+            return
+        try:
+            with open(join(path, Tagger.FILE_NAME), mode='rb') as file:
+                settings, generation, index = load(file)
+                # If words, marks or excludes changed, the index is useless
+                if settings == self._settings:
+                    self._index = index
+                    self._gen   = generation
+                    self._fresh = False
+        except (FileNotFoundError, EOFError, UnpicklingError, ValueError):
+            pass
+        # A fresh index is saved even if no file is tagged, otherwise it
+        # would stay fresh, and every file would be checked on each run,
+        # and a stale one is saved, so it is not considered stale anymore
+        self._stale = exists(join(path, Tagger.STALE_NAME))
+        self._dirty = self._fresh or self._stale
+
+        # If tags should be stored in a database as well
+        # NOTE: TagStore.Unavailable is not handled here, if the database
+        #       was asked for, but it cannot be used, the caller should know
+        if database:
+            self._store = store = TagStore(path)
+            if self._fresh:
+                store.clear()
+            # If database was just created, or it was not updated with the
+            # index (for example the database was not used for a while),
+            # fill it from the index again
+            elif store.generation != self._gen:
+                store.clear()
+                self._updated = {file: tags for file, (_, tags, _)
+                                                in self._index.items()}
+                self._dirty   = True
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def scanner(self):
+        # Return a new consumer, which can be fed with the blocks of a file
+        return Scanner(self._search, self._names, self._longest)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def scan(self, file):
+        scanner    = self.scanner()
+        block_size = Tagger.BLOCK_SIZE
+        with open(file, 'rb') as data:
+            buffer = data.read(block_size)
+            while buffer:
+                scanner.update(buffer)
+                buffer = data.read(block_size)
+        return scanner.finish()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def collect(self, file, check_sum=None, tags=None):
+        # NOTE: If the file has been scanned already (by a consumer returned
+        #       by `scanner`), its tags can be passed, so it is not read again
+
+        # If file has not changed since it was last scanned
+        try:
+            prev_check_sum, prev_tags, _ = self._index[file]
+            if (check_sum is not None and
+                check_sum == prev_check_sum):
+                    return prev_tags
+        except KeyError:
+            pass
+
+        # Scan file and store its tags
+        if tags is None:
+            tags = self.scan(file)
+        self._index[file] = check_sum, tags, Tagger.render(file, tags)
+        self._updated[file] = tags
+        self._dirty = True
+        return tags
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def check_sums(self):
+        # Return the check_sums of the files, which have been collected
+        return {file: check_sum for file, (check_sum, _, _)
+                                    in self._index.items()}
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def tags(self, files=None):
+        # Yield the (file, tags) pairs of the files (or of every
+        # file, if there are none) which have been collected already
+        index = self._index
+        for file in (sorted(index) if files is None else files):
+            try:
+                yield file, index[file][1]
+            except KeyError:
+                pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def forget(self, files):
+        index = self._index
+        for file in files:
+            if index.pop(file, None) is not None:
+                self._updated.pop(file, None)
+                self._removed.add(file)
+                self._dirty = True
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def rebuild(self):
+        self._index   = {}
+        self._updated = {}
+        self._removed = set()
+        self._dirty   = True
+        if self._store is not None:
+            self._store.clear()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def render(file, tags):
+        # Return the part of the report which belongs to file
+        if tags:
+            return ''.join(['{}\n'.format(file)] +
+                           ['{:>8}: {}: {}\n'.format(*tag) for tag in tags] +
+                           ['\n'])
+        return ''
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def to_file(self):
+        # If nothing changed since the last save
+        if (self._path is None or
+            not self._dirty):
+                return
+
+        # Save index with a new generation, which is stored in the database
+        # as well, so an outdated database can be recognised on load
+        # NOTE: The generation is random, so it does not start from the same
+        #       value after a fresh index, which could match an old database
+        self._gen  = randrange(1, 2**31)
+        index_path = join(self._path, Tagger.FILE_NAME)
+        with open(index_path + Tagger.TEMP_EXT, mode='wb') as file:
+            dump((self._settings, self._gen, self._index),
+                 file, HIGHEST_PROTOCOL)
+        replace(index_path + Tagger.TEMP_EXT, index_path)
+
+        # Merge the rendered parts of the files into the report (the names
+        # which are not valid UTF-8 are written back as the original bytes)
+        report_path = join(self._path, Tagger.REPORT_NAME)
+        with open(report_path + Tagger.TEMP_EXT,
+                  mode='w',
+                  encoding='utf-8',
+                  errors='surrogateescape') as file:
+            for path in sorted(self._index):
+                file.write(self._index[path][2])
+        replace(report_path + Tagger.TEMP_EXT, report_path)
+
+        # The saved index is up to date with the check_sums again
+        if self._stale:
+            try:
+                unlink(join(self._path, Tagger.STALE_NAME))
+            except FileNotFoundError:
+                pass
+            self._stale = False
+
+        # Write the changes to the database in a single transaction
+        if self._store is not None:
+            self._store.update(self._updated, self._removed, self._gen)
+        self._updated = {}
+        self._removed = set()
+        self._dirty   = False
@@ -0,0 +1,384 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os          import makedirs
+from os.path     import (join,
+                         dirname,
+                         abspath,
+                         expanduser,
+                         expandvars)
+from itertools   import chain
+from collections import (namedtuple,
+                         OrderedDict)
+
+# Import janitor modules
+from checker           import Checker
+from walker            import (walk,
+                               entry_of)
+from matcher           import Matcher
+from summaries         import Summaries
+from gitindex          import GitIndex
+from stats             import Stats
+from configer          import Configer
+from modules.tagger    import Tagger
+from modules.prefixer  import Prefixer
+
+
+#------------------------------------------------------------------------------#
+# A changed file: its path, the names of the modules using it, whether its
+# header was rewritten and its tags (None if it is not used by the tagger)
+File   = namedtuple('File', ('path', 'modules', 'prefixed', 'tags'))
+# The result of a run: the changed files, and the forgotten ones
+Result = namedtuple('Result', ('files', 'forgotten'))
+
+
+
+#------------------------------------------------------------------------------#
+class Session:
+
+    # NOTE: A session loads the configuration and the caches only once, so
+    #       a long running process (like a build system) can check the work
+    #       path again and again, paying only for the walk and the changed
+    #       files. Unlike the command line tool, it does not change the
+    #       current working directory, and it does not print anything
+
+    # Class level constants
+    CACHE_DIR   = '.janitor'
+    MODULES     = 'tagger', 'prefixer'
+    # Names and identifiers of the hashing algorithms
+    MD5         = 'MD5'
+    SHA1        = 'SHA1'
+    XXHASH      = 'xxHash'
+    HASH_IDS    = {MD5: 0, SHA1: 1, XXHASH: 2}
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class Unavailable(Exception): pass
+    class InvalidValue(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path      = None,
+                       config    = None,
+                       default   = False,
+                       md5       = False,
+                       sha       = False,
+                       paranoid  = False,
+                       git       = False,
+                       jobs      = 1,
+                       processes = False,
+                       rebuild   = False,
+                       exclude   = (),
+                       stats     = None):
+        # NOTE: Configer.InvalidConfigFileFormat, TagStore.Unavailable and
+        #       Prefixer.InvalidAlignment are not handled here, the caller
+        #       should decide what to do with an invalid configuration
+        self.stats = stats = stats or Stats()
+        self._runs = 0
+        self.path  = path  = abspath(expanduser(expandvars(path or '.')))
+        self.cache_dir     = cache_dir = join(path, Session.CACHE_DIR)
+        makedirs(cache_dir, exist_ok=True)
+
+        # Set configuration
+        with stats.phase('config'):
+            if default:
+                configer = Configer.from_default()
+            elif config:
+                configer = Configer(
+                    config_file_path=expanduser(expandvars(config)))
+            else:
+                configer = Configer(config_dir_path=path)
+        self.configer = configer
+
+        # Import hashing algorithm
+        if md5:
+            from hashlib  import md5    as hasher
+            self.hasher = Session.MD5
+        elif sha:
+            from hashlib  import sha1   as hasher
+            self.hasher = Session.SHA1
+        else:
+            try:
+                from pyhashxx import Hashxx as hasher
+            except ImportError:
+                raise Session.Unavailable('cannot use default hashing: '
+                                          'pyhashxx is not installed') from None
+            self.hasher = Session.XXHASH
+
+        # Set number of hashing threads (or processes)
+        try:
+            self.jobs = jobs = int(jobs)
+            if jobs < 1:
+                raise ValueError
+        except ValueError:
+            raise Session.InvalidValue('Invalid value for `jobs`: {!r} is not '
+                                       'a positive integer'.format(jobs)) \
+                                       from None
+        self.processes = processes
+
+        # Use the index of git, if the files are tracked
+        self.git_index = None
+        self.git_error = None
+        if (git and
+            not paranoid):
+                try:
+                    self.git_index = GitIndex(path)
+                except GitIndex.Unavailable as e:
+                    self.git_error = e
+
+        # Create checker
+        with stats.phase('load'):
+            self.checker = checker = Checker(cache_dir,
+                                             Session.HASH_IDS[self.hasher],
+                                             hasher,
+                                             paranoid,
+                                             jobs,
+                                             processes,
+                                             self.git_index,
+                                             stats)
+        if rebuild:
+            checker.rebuild()
+
+        # Compile the global and the module excludes, a file
+        # is skipped entirely, if it is excluded globally, or
+        # if it is excluded by every used module
+        self.modules = modules = \
+            OrderedDict((module, configer[module]['exclude'])
+                            for module in Session.MODULES
+                                if (configer[module]['use'] and
+                                    module not in exclude))
+        self.matcher = Matcher(path, configer['exclude'], modules)
+
+        # Create modules
+        self.tagger = tagger = None
+        if 'tagger' in modules:
+            with stats.phase('load'):
+                self.tagger = tagger = Tagger(cache_dir, **configer['tagger'])
+            if rebuild:
+                tagger.rebuild()
+            # If there are no tags collected yet, every file has
+            # to be scanned, not only the changed ones
+            elif tagger.fresh:
+                checker.rebuild()
+
+        # Only list the summarized folders, if something was added
+        # to or removed from them (or any of their subfolders)
+        self.summaries = None
+        if (configer['checker']['summarize'] and
+            not paranoid):
+                self.summaries = summaries = \
+                    Summaries(cache_dir,
+                              path,
+                              configer['checker']['summarize'],
+                              repr((configer['exclude'], modules)))
+                # If every file has to be checked
+                if (rebuild or
+                    (tagger is not None and
+                     tagger.fresh)):
+                        summaries.clear()
+
+        self.prefixer = None
+        if 'prefixer' in modules:
+            self.prefixer = Prefixer(**configer['prefixer'])
+
+        # If the check_sums were updated while the tagger was not used
+        if (tagger is not None and
+            tagger.stale and
+            not tagger.fresh and
+            not rebuild):
+                self._sync_tags()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _sync_tags(self):
+        # NOTE: The index of the tagger does not know about the files which
+        #       were changed, added or removed while it was not used, so the
+        #       removed ones are forgotten by the tagger, and the others are
+        #       forgotten by the checker, so they are checked (and scanned)
+        #       again as new files in the next run
+        checker = self.checker
+        known   = self.tagger.check_sums()
+        removed = [file for file, check_sum in known.items()
+                            if checker.check_sum(file) is None]
+        changed = [file for file, check_sum in known.items()
+                            if checker.check_sum(file) not in (None, check_sum)]
+        changed.extend(file for file in list(checker.files())
+                                if file not in known)
+        self.tagger.forget(removed)
+        checker.forget(changed)
+        # The files inside the summarized folders have to be walked as well
+        if (changed and
+            self.summaries is not None):
+                self.summaries.clear()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def walk(self, skip=None, watcher=None):
+        # Return the entries of every file in the work path, skip is called
+        # with the (path, is_folder) of every excluded file and folder
+        stats = self.stats
+        def skipped(path, folder):
+            stats.count('skipped')
+            if skip is not None:
+                skip(path, folder)
+        return walk(self.path, self.matcher, skipped, watcher, self.summaries)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def changes(self, watcher, timeout=None):
+        # Wait for the changes reported by watcher, and return the entries to
+        # check, whether they are all the files, and the removed files
+        matcher   = self.matcher
+        summaries = self.summaries
+        changed, created, removed, overflow = watcher.wait(timeout)
+        # The summaries of the folders of the changed files are outdated
+        if summaries is not None:
+            for file in changed:
+                summaries.invalidate(dirname(file))
+
+        # If the kernel dropped events, nothing can be
+        # trusted, so walk through everything again
+        if overflow:
+            return self.walk(watcher=watcher), True, removed
+
+        # Only check the reported files and the content of the new folders
+        files = filter(None, (entry_of(file, matcher) for file in changed))
+        files = chain(files, *(walk(folder, matcher, watcher=watcher,
+                                                     summaries=summaries)
+                                   for folder in created))
+        return files, False, removed
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def forget(self, files):
+        # Forget the removed files, and return the forgotten ones
+        forgotten = self.checker.forget(files)
+        if self.tagger is not None:
+            self.tagger.forget(forgotten)
+        return forgotten
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def run(self, entries=None, whole=None, update=False):
+        # Check the entries (or every file, if there are none), pass the
+        # changed ones to the modules, save the caches and return a Result,
+        # whole should be True, if every file of the work path is in the
+        # entries, so the missing ones can be forgotten. If this is an
+        # update only, the headers of the files are not rewritten
+        checker  = self.checker
+        tagger   = self.tagger
+        prefixer = self.prefixer
+        stats    = self.stats
+        # Every run is a new cycle of the statistics, except the first
+        # one, which includes the loading of the session as well, so the
+        # time spent between the runs (waiting for changes) is not counted
+        if self._runs:
+            stats.reset()
+        self._runs += 1
+        if whole is None:
+            whole = entries is None
+        if entries is None:
+            entries = self.walk()
+
+        # Read each changed file only once: the blocks hashed by the
+        # checker are fed to the tagger's scanner and to the prefixer
+        # NOTE: The consumers can be sent to other processes, and only
+        #       their results are sent back, the session itself decides
+        #       what to do with them, so only this process writes the cache
+        def consumers(entry):
+            feeds = {}
+            if 'tagger' in entry.modules:
+                feeds['tagger'] = tagger.scanner()
+            if (not update and
+                'prefixer' in entry.modules):
+                    head = prefixer.head(entry.path)
+                    if head is not None:
+                        feeds['prefixer'] = head
+            return feeds
+
+        files   = []
+        changed = []
+        entries = stats.timed(entries, 'walk', 'visited')
+        for entry, results in stats.timed(checker.changed(entries, consumers),
+                                          'hash', 'changed'):
+            file = entry.path
+            # NOTE: The file can be removed after it was hashed, while
+            #       its header is rewritten or its tags are collected
+            #       (as they are not collected while hashing, if the
+            #       check_sum is taken from the index of git), in which
+            #       case it is forgotten, just like the removed files
+            try:
+                # Rewrite the header of the file (if it is not up to
+                # date) before anything else reads its content, and
+                # hash it again, as it is not the same file anymore
+                tags = None
+                with stats.phase('prefixer'):
+                    prefixed = bool(not update and
+                                    'prefixer' in entry.modules and
+                                    prefixer.prefix(file,
+                                                    results.get('prefixer')))
+                if prefixed:
+                    with stats.phase('hash'):
+                        checker.update((file,))
+                else:
+                    tags = results.get('tagger')
+                # Collect tags, even if this is an update cycle
+                # only, as that does not change the file itself
+                if 'tagger' in entry.modules:
+                    with stats.phase('tagger'):
+                        tags = tagger.collect(file,
+                                              checker.check_sum(file),
+                                              tags)
+            except OSError:
+                checker.vanish(file)
+                continue
+            if not prefixed:
+                changed.append(file)
+            files.append(File(file, entry.modules, prefixed, tags))
+
+        # The files inside the skipped summarized folders were not
+        # walked through, but they are the same as they were
+        if self.summaries is not None:
+            checker.keep(self.summaries.kept())
+
+        # If any file changed since last check, update the cache
+        with stats.phase('save'):
+            if changed:
+                checker.update(changed)
+
+        # Forget the files which were removed after they were listed, and
+        # if every file was walked through, forget the ones which were not
+        # found either (deleted or excluded since the last walk)
+        forgotten = checker.vanished()
+        if whole:
+            forgotten.extend(checker.prune())
+        if forgotten:
+            if tagger is not None:
+                tagger.forget(forgotten)
+            removed = set(forgotten)
+            files   = [file for file in files if file.path not in removed]
+
+        # If anything changed (even if only the stat data of some files)
+        with stats.phase('save'):
+            if checker.dirty:
+                # The index of the tagger does not know about these changes
+                if tagger is None:
+                    Tagger.outdate(self.cache_dir)
+                checker.to_file()
+            if tagger is not None:
+                tagger.to_file()
+            if self.summaries is not None:
+                self.summaries.to_file()
+        return Result(files, forgotten)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def changed_files(self, entries=None, whole=None):
+        # Return the paths of the files changed since the last run, and
+        # remember them (and their tags), without rewriting their headers
+        return [file.path for file in self.run(entries, whole, True).files]
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        self.checker.close()
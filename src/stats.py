@@ -0,0 +1,127 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from json        import dumps
+from time        import perf_counter
+from itertools   import chain
+from collections import OrderedDict
+from contextlib  import contextmanager
+
+
+#------------------------------------------------------------------------------#
+class Stats:
+
+    # NOTE: Phases can be nested, and the time is always added to the
+    #       innermost one, so for example the time spent in the walk is not
+    #       added to the hashing, even though the checker pulls the walked
+    #       files, and the time not spent in any phase is added to OTHER
+
+    # Class level constants
+    OTHER    = 'other'
+    COUNTERS = ('visited',   # files walked through
+                'skipped',   # files and folders excluded
+                'unread',    # files found unchanged without reading them
+                'git',       # files identified by the index of git
+                'hashed',    # files read and hashed
+                'bytes',     # bytes read and hashed
+                'changed')   # files passed to the modules
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self):
+        self._cycle = 0
+        self.reset()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def reset(self):
+        # Start a new cycle
+        self._cycle += 1
+        self._times  = OrderedDict()
+        self._counts = OrderedDict((name, 0) for name in Stats.COUNTERS)
+        self._stack  = [Stats.OTHER]
+        self._start  = self._total = perf_counter()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def count(self, name, value=1):
+        self._counts[name] += value
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _switch(self):
+        # Add the time elapsed since the last switch to the current phase
+        now   = perf_counter()
+        phase = self._stack[-1]
+        self._times[phase] = self._times.get(phase, 0.0) + now - self._start
+        self._start = now
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @contextmanager
+    def phase(self, name):
+        self._switch()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def timed(self, iterable, name, counter=None):
+        # Yield the items of iterable, and add the time spent on producing
+        # them to the phase, and the number of them to the counter
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if counter is not None:
+                self._counts[counter] += 1
+            yield item
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def results(self):
+        # Return the times and the counters of the current cycle
+        self._switch()
+        counts = self._counts
+        probed = counts['unread'] + counts['git'] + counts['hashed']
+        return OrderedDict((
+            ('cycle'   , self._cycle),
+            ('total'   , perf_counter() - self._total),
+            ('phases'  , OrderedDict(self._times)),
+            ('counters', OrderedDict(counts)),
+            ('hit_rate', counts['unread']/probed if probed else 1.0),
+        ))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def report(self, indent=''):
+        # Return the lines of the human readable report of the current cycle
+        results = self.results()
+        width   = max(map(len, chain(('total', 'hit rate'),
+                                     results['phases'],
+                                     results['counters'])))
+        lines   = ['{}{:<{}} {:>10.3f} s'.format(indent, 'total', width,
+                                                 results['total'])]
+        for phase, seconds in results['phases'].items():
+            lines.append('{}{:<{}} {:>10.3f} s'.format(indent, phase, width,
+                                                       seconds))
+        for counter, value in results['counters'].items():
+            lines.append('{}{:<{}} {:>10}'.format(indent, counter, width, value))
+        lines.append('{}{:<{}} {:>10.1%}'.format(indent, 'hit rate', width,
+                                                 results['hit_rate']))
+        return lines
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def to_file(self, path):
+        # Write the results as a single line of JSON, the first cycle
+        # creates the file, the later ones (in watch mode) are appended
+        with open(path, mode='w' if self._cycle == 1 else 'a') as file:
+            file.write(dumps(self.results()) + '\n')
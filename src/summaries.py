@@ -0,0 +1,184 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os          import (stat,
+                         replace)
+from os.path     import (join,
+                         split)
+from pickle      import (dump,
+                         load,
+                         UnpicklingError,
+                         HIGHEST_PROTOCOL)
+from collections import namedtuple
+
+# Import janitor modules
+from matcher     import compile_globs
+
+
+#------------------------------------------------------------------------------#
+# The summary of a folder: its (st_mtime_ns, st_ino) pair
+# and the names of its walked subfolders
+Summary = namedtuple('Summary', ('status', 'folders'))
+
+
+
+#------------------------------------------------------------------------------#
+class Summaries:
+
+    # NOTE: The mtime of a folder only changes when an entry is added to,
+    #       removed from or renamed inside it, but not when the content of
+    #       a file inside it is changed. Therefore only the folders matching
+    #       the `summarize` patterns (which are expected to change only by
+    #       adding and removing files, like vendor or asset trees) and their
+    #       subfolders are summarized, and a summarized folder is considered
+    #       unchanged if its own and all its subfolders' mtimes are the same.
+    #       The decision is based on the stat data of the folders only, as
+    #       anything about their files would need listing the folders
+
+    # Class level constants
+    FILE_NAME = 'folders'
+    TEMP_EXT  = '.temp'
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, cache_dir, path, patterns, settings=''):
+        self._file     = join(cache_dir, Summaries.FILE_NAME)
+        self._path     = path.rstrip('/')
+        self._prefix   = len(self._path) + 1
+        self._match    = compile_globs(p.strip('/') for p in patterns)
+        self._settings = settings
+        self._covered  = {}
+        self._checked  = {}
+        self._records  = {}
+        self._kept     = []
+        self._dirty    = False
+        self._folders  = {}
+        try:
+            with open(self._file, mode='rb') as file:
+                settings, folders = load(file)
+                # If the excludes changed, other files are walked
+                if settings == self._settings:
+                    self._folders = folders
+        # If the file is broken, or it was written in an older format
+        except (FileNotFoundError, EOFError, UnpicklingError, ValueError,
+                TypeError):
+            pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def covers(self, folder):
+        # If folder or any of its parents inside the work path is summarized
+        try:
+            return self._covered[folder]
+        except KeyError:
+            pass
+        if (self._match is None or
+            len(folder) < self._prefix):
+                return False
+        covered = self._covered[folder] = \
+            (self._match(folder[self._prefix:]) is not None or
+             self.covers(split(folder)[0]))
+        return covered
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def unchanged(self, folder):
+        # Check folder and its subfolders without listing them, only by
+        # comparing their stat data, and remember the result for this walk
+        try:
+            return self._checked[folder]
+        except KeyError:
+            pass
+        summary = self._folders.get(folder)
+        if summary is None:
+            same = False
+        else:
+            try:
+                info = stat(folder)
+                same = ((info.st_mtime_ns, info.st_ino) == summary.status and
+                        all(self.unchanged(join(folder, name))
+                                for name in summary.folders))
+            except OSError:
+                same = False
+        self._checked[folder] = same
+        return same
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def keep(self, folder):
+        # Skip folder, as nothing changed inside it, and return
+        # all the folders inside it (including itself)
+        self._kept.append(folder)
+        folders = [folder]
+        for folder in folders:
+            folders.extend(join(folder, name)
+                               for name in self._folders[folder].folders)
+        return folders
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def kept(self):
+        # Return the folders skipped since the last call
+        kept, self._kept = self._kept, []
+        return kept
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def record(self, folder, status, folders):
+        # NOTE: `status` is the stat data of the folder collected before it
+        #       was listed, and `folders` are the names of the walked subfolders
+        self._records[folder] = Summary(status, tuple(folders))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def invalidate(self, folder):
+        # Forget the summary of folder (for example a file changed inside it),
+        # so it and all its parents will be listed again on the next walk
+        if self._folders.pop(folder, None) is not None:
+            self._dirty = True
+        self._records.pop(folder, None)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def clear(self):
+        self._folders = {}
+        self._records = {}
+        self._checked = {}
+        self._dirty   = True
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def to_file(self):
+        # Store the summaries of the folders listed during the walk:
+        # subfolders first, so a folder is only stored, if all of its
+        # subfolders are summarized as well
+        folders = self._folders
+        for folder in sorted(self._records, key=len, reverse=True):
+            summary = self._records[folder]
+            names   = summary.folders
+            # If a subfolder could not be listed
+            if not all(join(folder, name) in folders for name in names):
+                folders.pop(folder, None)
+            else:
+                # If a subfolder was removed since the last walk,
+                # forget the summaries of everything inside it
+                previous = folders.get(folder)
+                if previous is not None:
+                    for name in set(previous.folders).difference(names):
+                        removed = join(folder, name)
+                        for other in [f for f in folders
+                                          if (f == removed or
+                                              f.startswith(removed + '/'))]:
+                            del folders[other]
+                folders[folder] = summary
+        self._dirty  |= bool(self._records)
+        self._records = {}
+        self._checked = {}
+
+        # If nothing changed since the last save
+        if not self._dirty:
+            return
+        with open(self._file + Summaries.TEMP_EXT, mode='wb') as file:
+            dump((self._settings, folders), file, HIGHEST_PROTOCOL)
+        replace(self._file + Summaries.TEMP_EXT, self._file)
+        self._dirty = False
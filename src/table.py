@@ -0,0 +1,169 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os     import (fsencode,
+                    fsdecode)
+from mmap   import (mmap,
+                    ACCESS_READ)
+from struct import Struct
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+#   The file is made of five consecutive sections:
+#       header  : magic, hash id, number of entries, width of check_sums
+#       offsets : (count + 1) offsets of the paths, relative to the path-blob
+#       stats   : count (st_size, st_mtime_ns, st_ino) triplets
+#       sums    : count (length, check_sum) pairs padded to a fixed width
+#       paths   : the sorted and encoded paths concatenated
+_MAGIC   = b'JANITOR\x01'
+_HEADER  = Struct('<8siQH')
+_OFFSET  = Struct('<Q')
+_OFFSETS = Struct('<QQ')
+_STATUS  = Struct('<qqQ')
+_LENGTH  = Struct('<B')
+_NO_STAT = -1, -1, 0
+
+
+
+#------------------------------------------------------------------------------#
+class Table:
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class InvalidFormat(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def hash_id(self):
+        return self._hash_id
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, file):
+        # If file is too short to be a table, or has a different format
+        try:
+            self._data = data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            raise Table.InvalidFormat
+        try:
+            magic, hash_id, count, width = _HEADER.unpack_from(data)
+        except Exception:
+            data.close()
+            raise Table.InvalidFormat
+        if magic != _MAGIC:
+            data.close()
+            raise Table.InvalidFormat
+
+        # Store the positions of the sections
+        self._hash_id = hash_id
+        self._count   = count
+        self._width   = width
+        self._offsets = _HEADER.size
+        self._stats   = self._offsets + (count + 1)*_OFFSET.size
+        self._sums    = self._stats + count*_STATUS.size
+        self._paths   = self._sums + count*(_LENGTH.size + width)
+
+        # If the file was truncated (for example the disk was full, or the
+        # writer crashed), the sections do not fit into it, so it is not
+        # a table, and the entries are not looked up past its end
+        if (len(data) < self._paths or
+            len(data) < self._paths + _OFFSET.unpack_from(
+                            data, self._offsets + count*_OFFSET.size)[0]):
+                data.close()
+                raise Table.InvalidFormat
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __len__(self):
+        return self._count
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _path(self, index):
+        start, end = _OFFSETS.unpack_from(self._data,
+                                          self._offsets + index*_OFFSET.size)
+        return self._data[self._paths + start:self._paths + end]
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _entry(self, index):
+        status = _STATUS.unpack_from(self._data,
+                                     self._stats + index*_STATUS.size)
+        offset = self._sums + index*(_LENGTH.size + self._width)
+        length = self._data[offset]
+        offset += _LENGTH.size
+        return (self._data[offset:offset + length],
+                None if status == _NO_STAT else status)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _find(self, key):
+        # Return the index of the first path which is not less than key
+        path = self._path
+        low  = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) >> 1
+            if path(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def get(self, path):
+        key   = fsencode(path)
+        index = self._find(key)
+        if (index < self._count and
+            self._path(index) == key):
+                return self._entry(index)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def paths(self, prefix=''):
+        # Yield the paths starting with prefix, in order
+        key = fsencode(prefix)
+        for index in range(self._find(key), self._count):
+            path = self._path(index)
+            if not path.startswith(key):
+                return
+            yield fsdecode(path)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def items(self):
+        entry = self._entry
+        for index, path in enumerate(self.paths()):
+            yield path, entry(index)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        self._data.close()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @staticmethod
+    def write(file, hash_id, items):
+        # Sort entries by their encoded paths, as that is how they are searched
+        items = sorted((fsencode(path), entry) for path, entry in items)
+        count = len(items)
+        width = max((len(check_sum) for _, (check_sum, _) in items), default=0)
+
+        # Write sections
+        file.write(_HEADER.pack(_MAGIC, hash_id, count, width))
+        offset  = 0
+        offsets = [_OFFSET.pack(0)]
+        for path, _ in items:
+            offset += len(path)
+            offsets.append(_OFFSET.pack(offset))
+        file.write(b''.join(offsets))
+        file.write(b''.join(_STATUS.pack(*(status or _NO_STAT))
+                                for _, (_, status) in items))
+        file.write(b''.join(_LENGTH.pack(len(check_sum)) +
+                            check_sum.ljust(width, b'\0')
+                                for _, (check_sum, _) in items))
+        file.write(b''.join(path for path, _ in items))
@@ -0,0 +1,171 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os.path import join
+# sqlite3 is part of the standard library, but it is optional at build time
+try:
+    from sqlite3 import (connect,
+                         Error as SQLiteError,
+                         OperationalError)
+except ImportError:
+    connect = None
+
+
+#------------------------------------------------------------------------------#
+# Module level constants
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS files
+    (
+        id   INTEGER PRIMARY KEY,
+        path TEXT    NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS tags
+    (
+        id   INTEGER PRIMARY KEY,
+        file INTEGER NOT NULL,
+        line INTEGER NOT NULL,
+        word TEXT    NOT NULL,
+        text TEXT    NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS tags_word ON tags (word);
+    CREATE INDEX IF NOT EXISTS tags_file ON tags (file);
+'''
+_SCHEMA_FTS = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tags_text
+        USING fts5(text, content='tags', content_rowid='id');
+    CREATE TRIGGER IF NOT EXISTS tags_insert AFTER INSERT ON tags
+    BEGIN
+        INSERT INTO tags_text (rowid, text) VALUES (new.id, new.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS tags_delete AFTER DELETE ON tags
+    BEGIN
+        INSERT INTO tags_text (tags_text, rowid, text)
+            VALUES ('delete', old.id, old.text);
+    END;
+'''
+_SELECT = '''
+    SELECT files.path, tags.line, tags.word, tags.text
+        FROM tags JOIN files ON files.id = tags.file
+'''
+
+
+
+#------------------------------------------------------------------------------#
+class TagStore:
+
+    # Class level constants
+    FILE_NAME = 'tags.sqlite'
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class Unavailable(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def empty(self):
+        return self._connection.execute('SELECT 1 FROM files LIMIT 1'
+                                        ).fetchone() is None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def generation(self):
+        # The generation of the index of the tagger, which was stored last
+        return self._connection.execute('PRAGMA user_version').fetchone()[0]
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self, path):
+        # If python was built without sqlite3
+        if connect is None:
+            raise TagStore.Unavailable('sqlite3 is not available')
+        try:
+            self._connection = connection = connect(join(path,
+                                                         TagStore.FILE_NAME))
+            connection.executescript(_SCHEMA)
+            # If sqlite was built without the full text search extension,
+            # texts will be searched with the (much slower) LIKE instead
+            try:
+                connection.executescript(_SCHEMA_FTS)
+                self._fts = True
+            except OperationalError:
+                self._fts = False
+        except SQLiteError as e:
+            raise TagStore.Unavailable(str(e))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def update(self, updated, removed=(), generation=None):
+        # NOTE: `updated` is a mapping of files to their tags, every change
+        #       is written in a single transaction (with the generation of
+        #       the index, if it is passed), and only the rows of the passed
+        #       files are touched
+        with self._connection as connection:
+            execute = connection.execute
+            for file in removed:
+                execute('DELETE FROM tags WHERE file = '
+                        '(SELECT id FROM files WHERE path = ?)', (file,))
+                execute('DELETE FROM files WHERE path = ?', (file,))
+            for file, tags in updated.items():
+                row = execute('SELECT id FROM files WHERE path = ?',
+                              (file,)).fetchone()
+                if row is None:
+                    file_id = execute('INSERT INTO files (path) VALUES (?)',
+                                      (file,)).lastrowid
+                else:
+                    file_id, = row
+                    execute('DELETE FROM tags WHERE file = ?', (file_id,))
+                connection.executemany('INSERT INTO tags (file, line, word, '
+                                       'text) VALUES (?, ?, ?, ?)',
+                                       ((file_id,) + tuple(tag) for tag in tags))
+            if generation is not None:
+                execute('PRAGMA user_version = {:d}'.format(generation))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def clear(self):
+        with self._connection as connection:
+            connection.execute('DELETE FROM tags')
+            connection.execute('DELETE FROM files')
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def query(self, words=(), folders=(), texts=()):
+        # Every kind of condition is optional, conditions of the
+        # same kind are alternatives, different kinds are all required
+        conditions = []
+        arguments  = []
+        if words:
+            conditions.append('tags.word IN ({})'.format(
+                ', '.join('?'*len(words))))
+            arguments.extend(word.lower() for word in words)
+        if folders:
+            # Folders are searched as ranges of
+            # paths, so they can use the unique index
+            ranges = []
+            for folder in folders:
+                folder = join(folder, '')
+                ranges.append('(files.path >= ? AND files.path < ?)')
+                arguments.extend((folder, folder[:-1] + chr(ord('/') + 1)))
+            conditions.append('({})'.format(' OR '.join(ranges)))
+        for text in texts:
+            if self._fts:
+                conditions.append('tags.id IN (SELECT rowid FROM tags_text '
+                                  'WHERE tags_text MATCH ?)')
+                arguments.append('"{}"'.format(text.replace('"', '""')))
+            else:
+                conditions.append("tags.text LIKE ? ESCAPE '!'")
+                arguments.append('%{}%'.format(text.replace('!', '!!')
+                                                   .replace('%', '!%')
+                                                   .replace('_', '!_')))
+        statement = _SELECT
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY files.path, tags.line'
+        return self._connection.execute(statement, arguments).fetchall()
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,119 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os          import (stat,
+                         scandir)
+from os.path     import (split,
+                         splitext)
+from stat        import S_ISREG
+from collections import namedtuple
+
+
+#------------------------------------------------------------------------------#
+# A walked file: its full path, the folder it is in, its name, its extension
+# (without the leading dot), the (st_size, st_mtime_ns, st_ino) triplet and
+# the names of the modules using it
+Entry = namedtuple('Entry', ('path', 'root', 'name', 'ext', 'status', 'modules'))
+
+
+
+#------------------------------------------------------------------------------#
+def entry_of(path, matcher):
+    # Return the entry of path if it is a regular file (or a symbolic
+    # link to one, just like in `walk`), which is not excluded
+    try:
+        info = stat(path)
+    except OSError:
+        return
+    if S_ISREG(info.st_mode):
+        root, name = split(path)
+        ext        = splitext(name)[1][1:]
+        modules    = matcher.modules(root, name, ext)
+        if modules is not None:
+            return Entry(path, root, name, ext,
+                         (info.st_size, info.st_mtime_ns, info.st_ino), modules)
+
+#------------------------------------------------------------------------------#
+def walk(path, matcher, skip=None, watcher=None, summaries=None):
+    # If the top folder is excluded
+    if matcher.prune(path):
+        if skip is not None:
+            skip(path, True)
+        return
+
+    stack = [path]
+    while stack:
+        root = stack.pop()
+        # If nothing changed inside a summarized folder since the last
+        # walk, skip it, only subscribe to the changes of its folders
+        summarize = (summaries is not None and
+                     summaries.covers(root))
+        if summarize:
+            if summaries.unchanged(root):
+                kept = summaries.keep(root)
+                if watcher is not None:
+                    for folder in kept:
+                        watcher.add(folder)
+                continue
+            # Stat folder before listing it, so if it changes
+            # in the meantime, the next walk will list it again
+            try:
+                info   = stat(root)
+                status = info.st_mtime_ns, info.st_ino
+            except OSError:
+                continue
+
+        # If folder cannot be listed (permission
+        # denied, or removed since it was found)
+        try:
+            entries = scandir(root)
+        except OSError:
+            continue
+
+        # If watching, subscribe to the changes of this folder
+        if watcher is not None:
+            watcher.add(root)
+
+        # Go through all entries, files are yielded in the order they are
+        # listed, folders are walked after that, in the order they are listed
+        subfolders = []
+        with entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    # If entry is a folder, which is not excluded, walk it
+                    # NOTE: Symbolic links to folders are not followed (just
+                    #       like `os.walk` does not), so a link pointing to a
+                    #       parent folder is not a loop, but symbolic links to
+                    #       files are checked as the files they point to
+                    if entry.is_dir(follow_symlinks=False):
+                        if matcher.prune(entry.path):
+                            if skip is not None:
+                                skip(entry.path, True)
+                        else:
+                            subfolders.append(entry.path)
+                        continue
+                    # If entry is not a file
+                    elif not entry.is_file():
+                        continue
+                    # If file is excluded
+                    ext     = splitext(name)[1][1:]
+                    modules = matcher.modules(root, name, ext)
+                    if modules is None:
+                        if skip is not None:
+                            skip(entry.path, False)
+                        continue
+                    # NOTE: On most platforms this is the first and
+                    #       only stat call made on the file by janitor
+                    info = entry.stat()
+                # If entry was removed since it was listed
+                except OSError:
+                    continue
+                yield Entry(entry.path, root, name, ext,
+                            (info.st_size, info.st_mtime_ns, info.st_ino),
+                            modules)
+        if summarize:
+            summaries.record(root, status,
+                             (split(folder)[1] for folder in subfolders))
+        stack.extend(reversed(subfolders))
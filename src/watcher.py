@@ -0,0 +1,178 @@
+## INFO ##
+## INFO ##
+
+# Import python modules
+from os            import (read,
+                           close,
+                           fsencode,
+                           fsdecode,
+                           strerror)
+from os.path       import join
+from select        import select
+from struct        import Struct
+from ctypes        import (CDLL,
+                           get_errno)
+from ctypes.util   import find_library
+from collections   import OrderedDict
+
+
+#------------------------------------------------------------------------------#
+# Module level constants (from <sys/inotify.h>)
+_IN_MODIFY      = 0x00000002
+_IN_ATTRIB      = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM  = 0x00000040
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_DELETE      = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF   = 0x00000800
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_IGNORED     = 0x00008000
+_IN_ONLYDIR     = 0x01000000
+_IN_ISDIR       = 0x40000000
+_IN_NONBLOCK    = 0o4000
+_IN_CLOEXEC     = 0o2000000
+_IN_WATCH       = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+                   _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF |
+                   _IN_MOVE_SELF | _IN_ONLYDIR)
+_IN_GONE        = _IN_MOVED_FROM | _IN_DELETE
+_IN_NEW         = _IN_MOVED_TO | _IN_CREATE
+_EVENT          = Struct('iIII')
+
+
+
+#------------------------------------------------------------------------------#
+class Watcher:
+
+    # Class level constants
+    BUFFER_SIZE = 2**16
+    SETTLE_TIME = 0.1
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    class Unavailable(Exception): pass
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    @property
+    def error(self):
+        return self._error
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def __init__(self):
+        # If inotify is not supported on this platform
+        try:
+            self._libc = libc = CDLL(find_library('c'), use_errno=True)
+            self._fd   = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            raise Watcher.Unavailable(str(e))
+        if self._fd < 0:
+            raise Watcher.Unavailable(strerror(get_errno()))
+        self._folders = {}
+        self._error   = None
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def add(self, folder):
+        # Subscribe to the changes of the entries of folder
+        descriptor = self._libc.inotify_add_watch(self._fd,
+                                                  fsencode(folder),
+                                                  _IN_WATCH)
+        # If the folder cannot be watched (for example the max_user_watches
+        # limit is reached) store the reason, so the caller can fall back
+        if descriptor < 0:
+            self._error = strerror(get_errno())
+        else:
+            self._folders[descriptor] = folder
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def wait(self, timeout=None):
+        # Block until the first event arrives, then keep collecting events,
+        # until there was no new event for a short while, so that bursts of
+        # writes (for example a checkout) are processed in a single cycle
+        events = []
+        if select((self._fd,), (), (), timeout)[0]:
+            while True:
+                events.append(self._read())
+                if not select((self._fd,), (), (), Watcher.SETTLE_TIME)[0]:
+                    break
+        return self._collect(b''.join(events))
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _read(self):
+        data = []
+        try:
+            while True:
+                data.append(read(self._fd, Watcher.BUFFER_SIZE))
+        except BlockingIOError:
+            return b''.join(data)
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def _collect(self, data):
+        folders  = self._folders
+        changed  = OrderedDict()
+        created  = OrderedDict()
+        removed  = OrderedDict()
+        overflow = False
+
+        # Go through all events
+        offset = 0
+        size   = _EVENT.size
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            name    = data[offset + size:offset + size + length].rstrip(b'\0')
+            offset += size + length
+
+            # If events were dropped by the kernel
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+                continue
+
+            # If the folder itself is not watched anymore
+            if mask & _IN_IGNORED:
+                folders.pop(descriptor, None)
+                continue
+
+            # If event has no name, it is about the watched folder itself
+            try:
+                folder = folders[descriptor]
+            except KeyError:
+                continue
+            if not name:
+                continue
+            path = join(folder, fsdecode(name))
+
+            # If entry is a folder
+            if mask & _IN_ISDIR:
+                if mask & _IN_NEW:
+                    removed.pop(path, None)
+                    created[path] = None
+                elif mask & _IN_GONE:
+                    created.pop(path, None)
+                    removed[path] = None
+            # If entry is a file
+            elif mask & _IN_GONE:
+                changed.pop(path, None)
+                removed[path] = None
+            else:
+                removed.pop(path, None)
+                changed[path] = None
+
+        return list(changed), list(created), list(removed), overflow
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def fileno(self):
+        # The descriptor becomes readable, when there are events to wait for
+        return self._fd
+
+
+    #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - #
+    def close(self):
+        if self._fd >= 0:
+            close(self._fd)
+            self._fd = -1